@@ -1,29 +1,28 @@
-from fastapi import APIRouter, HTTPException, Depends, WebSocket, WebSocketDisconnect, Request
+from fastapi import APIRouter, HTTPException, Depends, WebSocket, WebSocketDisconnect, Request, Response, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID
-from .. import crud, schemas, models
-from ..database import SessionLocal
-from typing import List, Dict, Set, Optional
+from .. import crud, async_crud, schemas, models, realtime, game_service, wire
+from ..database import SessionLocal, AsyncSessionLocal
+from ..bot_executor import bot_executor, BotBusy, ANALYSIS_BUDGETS
+from ..bot_scheduler import bot_scheduler
+from ..ponder import ponderer
+from ..game_store import game_store, ActiveGame
+from ..broadcast import broadcaster
+from ..matchmaking import matchmaker, bucket_for
+from ..bitboard import BitBoard
+from typing import List, Dict, Set, Optional, Union
+from datetime import datetime
+import base64
 import json
+import asyncio
 from fastapi.encoders import jsonable_encoder
+from pydantic import ValidationError
 from collections import deque
-from threading import Lock
-from dataclasses import dataclass
-from typing import Optional
 
 router = APIRouter()
 
-# In-memory connection store per game
-game_connections: Dict[UUID, Set[WebSocket]] = {}
-
-@dataclass
-class WaitingPlayer:
-    id: UUID
-    websocket: WebSocket
-
-waiting_player: Optional[WaitingPlayer] = None
-waiting_lock = Lock()
-
 def get_db():
     db = SessionLocal()
     try:
@@ -31,146 +30,153 @@ def get_db():
     finally:
         db.close()
 
-@router.get("/api/games", response_model=List[schemas.GameState])
-def get_all_games(db: Session = Depends(get_db)):
-    games = crud.get_all_games(db)
-    return [schemas.GameState(
-        id=str(game.id), 
-        player_1=schemas.PlayerInfo(id=game.player_1.id, nickname=game.player_1.nickname, type=game.player_1.type),
-        player_2=schemas.PlayerInfo(id=game.player_2.id, nickname=game.player_2.nickname, type=game.player_2.type),
-        current_turn=game.current_turn,
-        board=game.board,
-        status=game.status) 
-        for game in games]
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def _encode_cursor(game) -> str:
+    return base64.urlsafe_b64encode(f"{game.created_at.isoformat()}|{game.id}".encode()).decode()
+
+def _decode_cursor(cursor: str):
+    try:
+        created_at, game_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), UUID(game_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@router.get("/api/games", response_model=Union[List[schemas.GameState], List[schemas.GameSummary]])
+def get_all_games(
+    response: Response,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    player_id: Optional[UUID] = None,
+    summary: bool = False,
+    db: Session = Depends(get_db),
+):
+    # Pages run newest first; the next page's cursor comes back in X-Next-Cursor.
+    after = _decode_cursor(cursor) if cursor else None
+    games = crud.list_games(db, limit + 1, after, status, player_id, summary)
+    if len(games) > limit:
+        games = games[:limit]
+        response.headers["X-Next-Cursor"] = _encode_cursor(games[-1])
+
+    result = []
+    for game in games:
+        # Games held in memory may have moves that are not flushed yet.
+        active = game_store.games.get(game.id)
+        if summary:
+            result.append(schemas.GameSummary(
+                id=str(game.id),
+                current_turn=active.current_turn if active else game.current_turn,
+                status=active.status if active else game.status,
+                created_at=game.created_at,
+                player_1=schemas.PlayerInfo.model_validate(game.player_1),
+                player_2=schemas.PlayerInfo.model_validate(game.player_2)))
+        else:
+            result.append((active or ActiveGame.from_model(game)).state())
+    return result
 
 @router.get("/api/games/{game_id}", response_model=schemas.GameState)
-def get_game_state(game_id: UUID, db: Session = Depends(get_db)):
-    game = crud.get_game(db, game_id)
+async def get_game_state(game_id: UUID, request: Request):
+    game = await game_store.get(game_id)
     if not game:
         raise HTTPException(status_code=404, detail=f"Game {game_id} not found")
-    return schemas.GameState(
-        id=str(game.id),
-        board=game.board,
-        current_turn=game.current_turn,
-        status=game.status,
-        player_1=schemas.PlayerInfo(
-            id=game.player_1.id, nickname=game.player_1.nickname, type=game.player_1.type),
-        player_2=schemas.PlayerInfo(
-            id=game.player_2.id, nickname=game.player_2.nickname, type=game.player_2.type)
-    )
+    etag = game.etag
+    if_none_match = request.headers.get("if-none-match", "")
+    if if_none_match == "*" or etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=game.state_json(), media_type="application/json", headers={"ETag": etag})
 
 @router.post("/api/game", response_model=schemas.GameState)
-def create_game(req: schemas.GameCreateRequest, db: Session = Depends(get_db)):
-    game = crud.create_game(db, req)
-    return schemas.GameState(
-        id=str(game.id),
-        board=game.board,
-        current_turn=game.current_turn,
-        status=game.status,
-        player_1=schemas.PlayerInfo(
-            id=game.player_1.id, nickname=game.player_1.nickname, type=game.player_1.type),
-        player_2=schemas.PlayerInfo(
-            id=game.player_2.id, nickname=game.player_2.nickname, type=game.player_2.type)
-    )
+async def create_game(req: schemas.GameCreateRequest, db: AsyncSession = Depends(get_async_db)):
+    game = game_store.add(await async_crud.create_game(db, req))
+    bot_scheduler.notify(game)
+    return game.state()
 
 @router.post("/api/games/{game_id}/move", response_model=schemas.GameState)
-async def make_move(game_id: UUID, move: schemas.Move, db: Session = Depends(get_db)):
-    game = crud.make_move(db, game_id, move)
-    game_state = schemas.GameState(
-        id=str(game.id),
-        board=game.board,
-        current_turn=game.current_turn,
-        status=game.status,
-        player_1=schemas.PlayerInfo(
-            id=game.player_1.id, nickname=game.player_1.nickname, type=game.player_1.type),
-        player_2=schemas.PlayerInfo(
-            id=game.player_2.id, nickname=game.player_2.nickname, type=game.player_2.type)
-    )
-
-    # Broadcast to WebSocket clients
-    if game_id in game_connections:
-        message = json.dumps(jsonable_encoder(game_state))
-        to_remove = set()
-        for connection in game_connections[game_id]:
-            try:
-                await connection.send_text(message)
-            except Exception:
-                to_remove.add(connection)
-        game_connections[game_id] -= to_remove
-
-    return game_state
+async def make_move(game_id: UUID, move: schemas.Move):
+    try:
+        outcome = await game_service.submit_move(game_id, move)
+    except game_service.GameNotFound:
+        raise HTTPException(status_code=404, detail=f"Game {game_id} not found")
+    return outcome.state
 
 @router.post("/api/games/{game_id}/bot_move/{difficulty}", response_model=schemas.GameState)
-async def make_bot_move(game_id: UUID, difficulty: str, db: Session = Depends(get_db)):
-    bot_move = crud.get_bot_move(db, game_id, difficulty)
-    game = crud.get_game(db, game_id)
-    if not bot_move:
+async def make_bot_move(game_id: UUID, difficulty: str):
+    try:
+        outcome = await game_service.submit_bot_move(game_id, difficulty)
+    except game_service.GameNotFound:
+        raise HTTPException(status_code=404, detail=f"Game {game_id} not found")
+    except game_service.DifficultyNotFound:
         raise HTTPException(status_code=404, detail="Difficulty not found.")
-
-    move = schemas.Move(player=game.current_turn, row=bot_move[0], side=bot_move[1])
-    game = crud.make_move(db, game_id, move)
-    game_state = schemas.GameState(
-        id=str(game.id),
-        board=game.board,
-        current_turn=game.current_turn,
-        status=game.status,
-        player_1=schemas.PlayerInfo(
-            id=game.player_1.id, nickname=game.player_1.nickname, type=game.player_1.type),
-        player_2=schemas.PlayerInfo(
-            id=game.player_2.id, nickname=game.player_2.nickname, type=game.player_2.type)
-    )
-
-    # Broadcast to WebSocket clients
-    if game_id in game_connections:
-        message = json.dumps(jsonable_encoder(game_state))
-        to_remove = set()
-        for connection in game_connections[game_id]:
-            try:
-                await connection.send_text(message)
-            except Exception:
-                to_remove.add(connection)
-        game_connections[game_id] -= to_remove
-
-    return game_state
+    except BotBusy:
+        raise HTTPException(status_code=503, detail="Bot workers are busy, try again shortly.")
+    return outcome.state
 
 @router.delete("/api/games/{game_id}")
-async def delete_game(game_id: UUID, db: Session = Depends(get_db)):
-    crud.delete_game(db, game_id)
+async def delete_game(game_id: UUID, db: AsyncSession = Depends(get_async_db)):
+    game_store.discard(game_id)
+    ponderer.discard(game_id)
+    await async_crud.delete_game(db, game_id)
     # Notify connected clients that the game was deleted
-    if game_id in game_connections:
-        message = json.dumps({
-            "id": str(game_id),
-            "status": "deleted"
-        })
-
-        to_remove = set()
-        for connection in game_connections[game_id]:
-            try:
-                await connection.send_text(message)
-            except:
-                to_remove.add(connection)
-
-        game_connections[game_id] -= to_remove
-        if not game_connections[game_id]:
-            del game_connections[game_id]
+    await realtime.publish_game_deleted(game_id)
     return {"detail": f"Game {game_id} deleted"}
 
+@router.post("/api/analysis")
+async def analyze_positions(req: schemas.AnalysisRequest):
+    boards = []
+    for index, position in enumerate(req.positions):
+        if position.side not in ('x', 'o'):
+            raise HTTPException(status_code=422, detail=f"Invalid side at position {index}")
+        try:
+            boards.append(BitBoard.from_board(position.board, position.side))
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=f"Invalid board at position {index}: {e}")
+
+    async def analyze(index, position):
+        depth, time_budget = ANALYSIS_BUDGETS.get(position.difficulty, (None, None))
+        if position.depth is not None:
+            depth = position.depth
+        if position.time_budget is not None:
+            time_budget = position.time_budget
+        result = await bot_executor.analyze(boards[index], position.side, depth, time_budget)
+        return schemas.AnalysisResult(
+            index=index,
+            move=schemas.AnalysisMove(row=result.move[0], side=result.move[1]) if result.move else None,
+            score=result.score,
+            depth=result.depth,
+            nodes=result.nodes,
+            pv=[schemas.AnalysisMove(row=row, side=side) for row, side in result.pv])
+
+    async def stream():
+        tasks = [asyncio.create_task(analyze(i, p)) for i, p in enumerate(req.positions)]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                result = await finished
+                yield result.model_dump_json() + "\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
 @router.get("/api/players", response_model=List[schemas.PlayerInfo])
 def get_all_players(db: Session = Depends(get_db)):
     players = crud.get_all_players(db)
-    return [schemas.PlayerInfo(id=player.id, nickname=player.nickname, type=player.type) for player in players]
+    return [schemas.PlayerInfo.model_validate(player) for player in players]
 
 @router.get("/api/players/{player_id}", response_model=schemas.PlayerInfo)
 def get_player(player_id: UUID, db: Session = Depends(get_db)):
     player = crud.get_player(db, player_id)
     if not player:
         raise HTTPException(status_code=404, detail=f"Player {player_id} not found")
-    return schemas.PlayerInfo(id=player.id, nickname=player.nickname, type=player.type)
+    return schemas.PlayerInfo.model_validate(player)
 
 @router.post("/api/player", response_model=schemas.PlayerInfo)
 def create_player(player: schemas.PlayerCreate, db: Session = Depends(get_db)):
     db_player = crud.create_player(db, player)
-    return schemas.PlayerInfo(id=db_player.id, nickname=db_player.nickname, type=db_player.type)
+    return schemas.PlayerInfo.model_validate(db_player)
 
 @router.delete("/api/players/{player_id}")
 def delete_player(player_id: UUID, db: Session = Depends(get_db)):
@@ -178,73 +184,117 @@ def delete_player(player_id: UUID, db: Session = Depends(get_db)):
     return {"detail": f"Player {player_id} deleted"}
 
 async def websocket_endpoint(websocket: WebSocket, game_id: UUID):
+    # ?protocol=full|delta&encoding=json|binary choose the update format, see app/wire.py.
+    fmt = wire.WireFormat(websocket.query_params.get("protocol", "full"),
+                          websocket.query_params.get("encoding", "json"))
+    if fmt.protocol not in wire.PROTOCOLS or fmt.encoding not in wire.ENCODINGS:
+        await websocket.close(code=1008)
+        return
     await websocket.accept()
-    if game_id not in game_connections:
-        game_connections[game_id] = set()
-    game_connections[game_id].add(websocket)
+    broadcaster.subscribe(game_id, websocket, fmt)
 
     try:
+        if fmt.protocol == "delta":
+            await _send_snapshot(game_id, websocket, fmt)
         while True:
-            await websocket.receive_text()  # no-op for now
+            text = await websocket.receive_text()
+            if fmt.protocol == "delta" and _is_resync(text):
+                await _send_snapshot(game_id, websocket, fmt)
+                continue
+            reply = await _handle_game_message(game_id, text, fmt)
+            broadcaster.send(game_id, websocket, json.dumps(reply))
     except WebSocketDisconnect:
-        game_connections[game_id].remove(websocket)
-        if not game_connections[game_id]:
-            del game_connections[game_id]
+        pass
+    finally:
+        broadcaster.unsubscribe(game_id, websocket)
+
+
+async def _send_snapshot(game_id: UUID, websocket: WebSocket, fmt: wire.WireFormat):
+    game = await game_store.get(game_id)
+    if game:
+        broadcaster.send(game_id, websocket, wire.snapshot(fmt, game.state().model_dump(mode="json"), game.ply))
+
+def _is_resync(text: str) -> bool:
+    try:
+        return json.loads(text).get("type") == "resync"
+    except (ValueError, AttributeError):
+        return False
+
+
+def _ws_error(request_id, status: int, detail: str) -> dict:
+    return {"type": "error", "id": request_id, "status": status, "detail": detail}
+
+async def _handle_game_message(game_id: UUID, text: str, fmt: wire.WireFormat) -> dict:
+    # Requests are {"type": "move", "id": ..., "player", "row", "side"} or
+    # {"type": "bot_move", "id": ..., "difficulty"}; the reply echoes the id.
+    try:
+        message = json.loads(text)
+        request_id = message.get("id")
+        kind = message.get("type")
+    except (ValueError, AttributeError):
+        return _ws_error(None, 400, "Invalid JSON message")
+    try:
+        if kind == "move":
+            outcome = await game_service.submit_move(game_id, schemas.Move.model_validate(message))
+        elif kind == "bot_move":
+            outcome = await game_service.submit_bot_move(game_id, str(message.get("difficulty")))
+        else:
+            return _ws_error(request_id, 400, f"Unknown message type {kind!r}")
+    except ValidationError as e:
+        return _ws_error(request_id, 422, str(e))
+    except game_service.GameNotFound:
+        return _ws_error(request_id, 404, f"Game {game_id} not found")
+    except game_service.DifficultyNotFound:
+        return _ws_error(request_id, 404, "Difficulty not found.")
+    except BotBusy:
+        return _ws_error(request_id, 503, "Bot workers are busy, try again shortly.")
+    if not outcome.applied:
+        return _ws_error(request_id, 409, "Move rejected: not your turn, illegal move or game over")
+    if fmt.protocol == "delta":
+        # The delta broadcast already carries the move.
+        return {"type": "ack", "id": request_id, "version": outcome.version}
+    return {"type": "ack", "id": request_id, "state": jsonable_encoder(outcome.state)}
 
 
 @router.websocket("/ws/waiting/{player_id}")
-async def waiting_room_ws(websocket: WebSocket, player_id: UUID):
-    global waiting_player
+async def waiting_room_ws(websocket: WebSocket, player_id: UUID,
+                          rating: Optional[int] = None, bracket: Optional[str] = None):
     await websocket.accept()
-
-    with waiting_lock:
-        waiting_player = WaitingPlayer(id=player_id, websocket=websocket)
+    await matchmaker.wait(player_id, websocket, bucket_for(rating, bracket))
 
     try:
         while True:
             await websocket.receive_text()
     except WebSocketDisconnect:
-        with waiting_lock:
-            if waiting_player and waiting_player.id == player_id:
-                waiting_player = None
+        pass
+    finally:
+        await matchmaker.leave(player_id, websocket)
 
 
 @router.post("/api/online-game")
-async def find_online_game(request: Request, db: Session = Depends(get_db)):
-    global waiting_player
+async def find_online_game(request: Request, db: AsyncSession = Depends(get_async_db)):
     try:
         data = await request.json()
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid JSON payload")
     player_id = UUID(data["player_id"])
 
-    with waiting_lock:
-        if waiting_player and waiting_player.id != player_id:
-            opponent = waiting_player
-            waiting_player = None
-
-            req = schemas.GameCreateRequest(player_1_id=opponent.id, player_2_id=player_id)
-            game = crud.create_game(db, req)
-
-            game_state = schemas.GameState(
-                id=str(game.id),
-                board=game.board,
-                current_turn=game.current_turn,
-                status=game.status,
-                player_1=schemas.PlayerInfo(
-                    id=game.player_1.id, nickname=game.player_1.nickname, type=game.player_1.type),
-                player_2=schemas.PlayerInfo(
-                    id=game.player_2.id, nickname=game.player_2.nickname, type=game.player_2.type)
-            )
-
-            try:
-                await opponent.websocket.send_text(json.dumps(jsonable_encoder(game_state)))
-            except:
-                pass  # If they're disconnected, we just fail silently
-
-            return {
-                "waiting": False,
-                "game": jsonable_encoder(game_state)
-            }
-
+    opponent = await matchmaker.find_opponent(player_id, bucket_for(data.get("rating"), data.get("bracket")))
+    if opponent is None:
         return { "waiting": True }
+
+    try:
+        req = schemas.GameCreateRequest(player_1_id=opponent.id, player_2_id=player_id)
+        game = await async_crud.create_game(db, req)
+    except Exception:
+        await matchmaker.cancel_match(opponent)
+        raise
+    active = game_store.add(game)
+    bot_scheduler.notify(active)
+    game_state = jsonable_encoder(active.state())
+    await matchmaker.announce_match(opponent, game_state)
+
+    return {
+        "waiting": False,
+        "game": game_state
+    }
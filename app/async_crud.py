@@ -0,0 +1,135 @@
+import uuid
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import DateTime, and_, delete, insert, literal, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased, joinedload
+from . import models, schemas
+from .game_logic import initial_board
+
+# Async counterparts of the crud functions used by the async routes and the game store.
+
+async def get_game_with_players(db: AsyncSession, game_id: uuid.UUID) -> Optional[models.Game]:
+    result = await db.execute(
+        select(models.Game)
+        .options(joinedload(models.Game.player_1), joinedload(models.Game.player_2))
+        .where(models.Game.id == game_id)
+    )
+    return result.scalars().first()
+
+async def create_game(db: AsyncSession, req: schemas.GameCreateRequest) -> models.Game:
+    game = models.Game(
+        player_1_id=req.player_1_id,
+        player_2_id=req.player_2_id,
+        board=initial_board(),
+        current_turn='x',
+        status='in_progress'
+    )
+    db.add(game)
+    await db.commit()
+    return await get_game_with_players(db, game.id)
+
+async def list_bot_turn_game_ids(db: AsyncSession, bot_types) -> list[uuid.UUID]:
+    # In-progress games where the player to move is one of bot_types; player_1 plays 'x'.
+    player_1 = aliased(models.Player)
+    player_2 = aliased(models.Player)
+    result = await db.execute(
+        select(models.Game.id)
+        .join(player_1, models.Game.player_1_id == player_1.id)
+        .join(player_2, models.Game.player_2_id == player_2.id)
+        .where(
+            models.Game.status == 'in_progress',
+            or_(
+                and_(models.Game.current_turn == 'x', player_1.type.in_(bot_types)),
+                and_(models.Game.current_turn == 'o', player_2.type.in_(bot_types)),
+            ),
+        )
+    )
+    return list(result.scalars())
+
+async def save_games(db: AsyncSession, rows: list[dict], moves: list[dict]):
+    if rows:
+        await db.execute(update(models.Game), rows)
+    if moves:
+        await db.execute(insert(models.GameMove), moves)
+    await db.commit()
+
+async def save_game(db: AsyncSession, row: dict, moves: list[dict]) -> bool:
+    # Compare-and-set write of one game: only if every stone stored is also on the
+    # new board, i.e. no other writer has moved in it meanwhile. False otherwise.
+    values = {key: value for key, value in row.items() if key != "id"}
+    result = await db.execute(
+        update(models.Game)
+        .where(
+            models.Game.id == row["id"],
+            models.Game.board_x.op("&")(~row["board_x"]) == 0,
+            models.Game.board_o.op("&")(~row["board_o"]) == 0,
+        )
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        await db.rollback()
+        return False
+    if moves:
+        await db.execute(insert(models.GameMove), moves)
+    await db.commit()
+    return True
+
+async def delete_game(db: AsyncSession, game_id: uuid.UUID):
+    result = await db.execute(
+        select(models.Game.player_1_id, models.Game.player_2_id).where(models.Game.id == game_id))
+    players = result.first()
+    if players:
+        await db.execute(delete(models.GameMove).where(models.GameMove.game_id == game_id))
+        await db.execute(delete(models.Game).where(models.Game.id == game_id))
+        # Delete associated players
+        await db.execute(delete(models.Player).where(models.Player.id.in_(set(players))))
+        await db.commit()
+
+async def archive_finished_games(db: AsyncSession, finished_before: datetime, limit: int) -> list[uuid.UUID]:
+    # Copies up to limit finished games into archived_games with one INSERT ... SELECT,
+    # then deletes their moves and rows; returns the ids moved.
+    result = await db.execute(
+        select(models.Game.id)
+        .where(
+            models.Game.status != 'in_progress',
+            models.Game.updated_at < finished_before,
+            models.Game.board_x.is_not(None),
+        )
+        .limit(limit)
+    )
+    game_ids = list(result.scalars())
+    if not game_ids:
+        return game_ids
+    await db.execute(
+        insert(models.ArchivedGame).from_select(
+            ["id", "player_1_id", "player_2_id", "board_x", "board_o", "status", "created_at",
+             "finished_at", "archived_at"],
+            select(models.Game.id, models.Game.player_1_id, models.Game.player_2_id, models.Game.board_x,
+                   models.Game.board_o, models.Game.status, models.Game.created_at, models.Game.updated_at,
+                   literal(datetime.utcnow(), DateTime()))
+            .where(models.Game.id.in_(game_ids))
+        )
+    )
+    await db.execute(delete(models.GameMove).where(models.GameMove.game_id.in_(game_ids)))
+    await db.execute(delete(models.Game).where(models.Game.id.in_(game_ids)))
+    await db.commit()
+    return game_ids
+
+async def expire_abandoned_games(db: AsyncSession, idle_before: datetime, limit: int) -> list[uuid.UUID]:
+    # Marks up to limit in-progress games without a move since idle_before as abandoned.
+    result = await db.execute(
+        select(models.Game.id)
+        .where(models.Game.status == 'in_progress', models.Game.updated_at < idle_before)
+        .limit(limit)
+    )
+    game_ids = list(result.scalars())
+    if game_ids:
+        await db.execute(
+            update(models.Game)
+            .where(models.Game.id.in_(game_ids), models.Game.status == 'in_progress')
+            .values(status='abandoned', updated_at=datetime.utcnow())
+        )
+        await db.commit()
+    return game_ids
@@ -0,0 +1,413 @@
+import random
+from typing import List, NamedTuple
+
+ROWS = 7
+COLS = 7
+CELLS = ROWS * COLS
+FULL = (1 << CELLS) - 1
+
+SIDES = ('L', 'R')
+# A move is encoded as row * 2 + side, where side 0 is 'L' and 1 is 'R'.
+MOVES = range(ROWS * 2)
+
+
+def encode_move(row, side):
+    return row * 2 + (1 if side == 'R' else 0)
+
+
+def decode_move(move):
+    return (move >> 1, SIDES[move & 1])
+
+
+def other(symbol):
+    return 'o' if symbol == 'x' else 'x'
+
+
+def _cell_mask(predicate):
+    mask = 0
+    for r in range(ROWS):
+        for c in range(COLS):
+            if predicate(r, c):
+                mask |= 1 << (r * COLS + c)
+    return mask
+
+
+# Start cells from which a four-in-a-row fits without wrapping into the next row.
+_H_MASK = _cell_mask(lambda r, c: c + 3 < COLS)
+_D1_MASK = _cell_mask(lambda r, c: c + 3 < COLS and r + 3 < ROWS)   # ↘
+_D2_MASK = _cell_mask(lambda r, c: c - 3 >= 0 and r + 3 < ROWS)     # ↙
+
+
+def has_four(bits):
+    # Horizontal
+    m = bits & (bits >> 1)
+    if m & (m >> 2) & _H_MASK:
+        return True
+    # Vertical
+    m = bits & (bits >> COLS)
+    if m & (m >> (2 * COLS)):
+        return True
+    # Diagonal ↘
+    m = bits & (bits >> (COLS + 1))
+    if m & (m >> (2 * (COLS + 1))) & _D1_MASK:
+        return True
+    # Diagonal ↙
+    m = bits & (bits >> (COLS - 1))
+    if m & (m >> (2 * (COLS - 1))) & _D2_MASK:
+        return True
+    return False
+
+
+# (shift, start mask) for each line direction: horizontal, vertical, ↘, ↙.
+_LINES = ((1, _H_MASK), (COLS, FULL >> (3 * COLS)), (COLS + 1, _D1_MASK), (COLS - 1, _D2_MASK))
+
+
+def threat_cells(bits, empty):
+    """Empty cells that would complete four-in-a-row for ``bits``."""
+    threats = 0
+    for shift, starts in _LINES:
+        s1 = bits >> shift
+        s2 = bits >> (2 * shift)
+        s3 = bits >> (3 * shift)
+        threats |= (starts & (empty & s1 & s2 & s3))
+        threats |= (starts & (bits & (empty >> shift) & s2 & s3)) << shift
+        threats |= (starts & (bits & s1 & (empty >> (2 * shift)) & s3)) << (2 * shift)
+        threats |= (starts & (bits & s1 & s2 & (empty >> (3 * shift)))) << (3 * shift)
+    return threats
+
+
+def _build_windows():
+    windows = []
+    for r in range(ROWS):
+        for c in range(COLS):
+            for dr, dc in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                end_r, end_c = r + 3 * dr, c + 3 * dc
+                if 0 <= end_r < ROWS and 0 <= end_c < COLS:
+                    mask = 0
+                    for i in range(4):
+                        mask |= 1 << ((r + i * dr) * COLS + c + i * dc)
+                    windows.append(mask)
+    return tuple(windows)
+
+
+# Every 4-cell line on the board (horizontal, vertical and both diagonals).
+WINDOWS = _build_windows()
+# Indices of the windows each cell belongs to.
+CELL_WINDOWS = tuple(
+    tuple(i for i, w in enumerate(WINDOWS) if w >> cell & 1) for cell in range(CELLS))
+
+
+def _window_score(x_count, o_count):
+    if x_count and not o_count:
+        return x_count
+    if o_count and not x_count:
+        return -o_count
+    return 0
+
+
+# A window's stones are tracked as the code x_count * 5 + o_count. These tables
+# give the change in x's score when one more x (or o) stone lands in a window.
+_CODES = range(25)
+DELTA_X = tuple(
+    _window_score(c // 5 + 1, c % 5) - _window_score(c // 5, c % 5) if c // 5 < 4 else 0
+    for c in _CODES)
+DELTA_O = tuple(
+    _window_score(c // 5, c % 5 + 1) - _window_score(c // 5, c % 5) if c % 5 < 4 else 0
+    for c in _CODES)
+
+
+# Window codes of three stones of one player and none of the other.
+_THREE_X = 3 * 5
+_THREE_O = 3
+
+
+class Tactics(NamedTuple):
+    moves: List[int]
+    wins: List[int]     # moves that complete four for the player to move
+    blocks: List[int]   # moves onto a cell that would complete four for the opponent
+
+
+# Zobrist keys per cell for each player, fixed seed so keys agree across processes.
+_zobrist_rng = random.Random(0x51DE57AC)
+ZOBRIST_X = tuple(_zobrist_rng.getrandbits(64) for _ in range(CELLS))
+ZOBRIST_O = tuple(_zobrist_rng.getrandbits(64) for _ in range(CELLS))
+ZOBRIST_O_TO_MOVE = _zobrist_rng.getrandbits(64)
+
+# Mirroring the board left-right maps cell (r, c) to (r, COLS - 1 - c) and a
+# move to the same row from the other side, i.e. move ^ 1.
+MIRROR_CELL = tuple(r * COLS + COLS - 1 - c for r in range(ROWS) for c in range(COLS))
+MIRROR_ZOBRIST_X = tuple(ZOBRIST_X[MIRROR_CELL[cell]] for cell in range(CELLS))
+MIRROR_ZOBRIST_O = tuple(ZOBRIST_O[MIRROR_CELL[cell]] for cell in range(CELLS))
+
+
+class BitBoard:
+    """7x7 side-stacker position as one bitmask per player.
+
+    Cell (r, c) is bit r * COLS + c. Stones in a row always form a prefix
+    filled from the left and a suffix filled from the right, so each row only
+    needs the next free column on either side. ``key`` is the Zobrist hash
+    of the stones, ``mirror_key`` the hash of the left-right mirrored
+    position and ``score`` the window evaluation from x's point of view; all
+    are updated incrementally by play/undo, touching only the windows
+    through the changed cell.
+    """
+
+    __slots__ = ('x', 'o', 'left', 'right', 'count', 'history', 'key', 'mirror_key', 'windows', 'score')
+
+    def __init__(self):
+        self.x = 0
+        self.o = 0
+        self.left = [0] * ROWS
+        self.right = [COLS - 1] * ROWS
+        self.count = 0
+        self.history = []
+        self.key = 0
+        self.mirror_key = 0
+        self.windows = [0] * len(WINDOWS)
+        self.score = 0
+
+    @classmethod
+    def from_board(cls, board, to_move=None):
+        """Packs a 7x7 list of 'x', 'o' and '_' cells.
+
+        Raises ValueError unless every row is a left prefix and a right
+        suffix of stones around one run of empty cells, and, when
+        ``to_move`` is given, unless the stone counts fit that player (x
+        moves first).
+        """
+        if len(board) != ROWS:
+            raise ValueError(f"board must have {ROWS} rows")
+        bb = cls()
+        for r in range(ROWS):
+            row = board[r]
+            if len(row) != COLS:
+                raise ValueError(f"row {r} must have {COLS} cells")
+            for c in range(COLS):
+                cell = row[c]
+                if cell == 'x':
+                    bb.x |= 1 << (r * COLS + c)
+                    bb.key ^= ZOBRIST_X[r * COLS + c]
+                    bb.mirror_key ^= MIRROR_ZOBRIST_X[r * COLS + c]
+                    bb.count += 1
+                elif cell == 'o':
+                    bb.o |= 1 << (r * COLS + c)
+                    bb.key ^= ZOBRIST_O[r * COLS + c]
+                    bb.mirror_key ^= MIRROR_ZOBRIST_O[r * COLS + c]
+                    bb.count += 1
+                elif cell != '_':
+                    raise ValueError(f"invalid cell {cell!r} in row {r}")
+            empty = [c for c in range(COLS) if row[c] == '_']
+            if empty and empty[-1] - empty[0] + 1 != len(empty):
+                raise ValueError(f"row {r} has stones between empty cells")
+            if empty:
+                bb.left[r] = empty[0]
+                bb.right[r] = empty[-1]
+            else:
+                bb.left[r] = COLS
+                bb.right[r] = COLS - 1
+        if to_move is not None:
+            lead = bb.x.bit_count() - bb.o.bit_count()
+            if lead != (0 if to_move == 'x' else 1):
+                raise ValueError(f"stone counts do not fit {to_move!r} to move")
+        bb._count_windows()
+        return bb
+
+    @classmethod
+    def from_bits(cls, x, o):
+        bb = cls()
+        bb.x = x
+        bb.o = o
+        occupied = x | o
+        for cell in range(CELLS):
+            if x >> cell & 1:
+                bb.key ^= ZOBRIST_X[cell]
+                bb.mirror_key ^= MIRROR_ZOBRIST_X[cell]
+            elif o >> cell & 1:
+                bb.key ^= ZOBRIST_O[cell]
+                bb.mirror_key ^= MIRROR_ZOBRIST_O[cell]
+        bb.count = occupied.bit_count()
+        for r in range(ROWS):
+            lo, hi = 0, COLS - 1
+            while lo <= hi and occupied >> (r * COLS + lo) & 1:
+                lo += 1
+            while hi >= lo and occupied >> (r * COLS + hi) & 1:
+                hi -= 1
+            bb.left[r] = lo
+            bb.right[r] = hi
+        bb._count_windows()
+        return bb
+
+    def _count_windows(self):
+        self.score = 0
+        for i, w in enumerate(WINDOWS):
+            x_count = (self.x & w).bit_count()
+            o_count = (self.o & w).bit_count()
+            self.windows[i] = x_count * 5 + o_count
+            self.score += _window_score(x_count, o_count)
+
+    def to_board(self):
+        board = []
+        for r in range(ROWS):
+            row = []
+            for c in range(COLS):
+                bit = 1 << (r * COLS + c)
+                if self.x & bit:
+                    row.append('x')
+                elif self.o & bit:
+                    row.append('o')
+                else:
+                    row.append('_')
+            board.append(row)
+        return board
+
+    def hash(self, to_move):
+        return self.key ^ ZOBRIST_O_TO_MOVE if to_move == 'o' else self.key
+
+    def canonical_hash(self, to_move):
+        """Hash shared by a position and its mirror image.
+
+        Returns (key, mirrored); when ``mirrored`` is true the key is the
+        mirror's, so moves stored under it must be flipped with ``move ^ 1``.
+        """
+        key, mirror_key = self.key, self.mirror_key
+        if to_move == 'o':
+            key ^= ZOBRIST_O_TO_MOVE
+            mirror_key ^= ZOBRIST_O_TO_MOVE
+        if mirror_key < key:
+            return mirror_key, True
+        return key, False
+
+    def is_symmetric(self):
+        # Mirror-symmetric positions have equivalent L and R moves in every row.
+        return self.key == self.mirror_key
+
+    def bits(self, symbol):
+        return self.x if symbol == 'x' else self.o
+
+    def can_play(self, move):
+        row = move >> 1
+        return self.left[row] <= self.right[row]
+
+    def legal_moves(self):
+        left, right = self.left, self.right
+        return [m for m in MOVES if left[m >> 1] <= right[m >> 1]]
+
+    def playable_cells(self):
+        # The cells the legal moves would fill, as a mask.
+        cells = 0
+        for row in range(ROWS):
+            lo, hi = self.left[row], self.right[row]
+            if lo <= hi:
+                cells |= 1 << (row * COLS + lo) | 1 << (row * COLS + hi)
+        return cells
+
+    def tactics(self, symbol):
+        """Legal moves, immediate wins and forced blocks for ``symbol`` in one pass.
+
+        Only the windows through each move's target cell are looked at: the
+        move wins if one of them already holds three of ``symbol``'s stones
+        and must be blocked if one holds three of the opponent's.
+        """
+        own, opp = (_THREE_X, _THREE_O) if symbol == 'x' else (_THREE_O, _THREE_X)
+        left, right, windows = self.left, self.right, self.windows
+        moves, wins, blocks = [], [], []
+        for move in MOVES:
+            row = move >> 1
+            lo, hi = left[row], right[row]
+            if lo > hi:
+                continue
+            moves.append(move)
+            win = block = False
+            for w in CELL_WINDOWS[row * COLS + (hi if move & 1 else lo)]:
+                code = windows[w]
+                if code == own:
+                    win = True
+                elif code == opp:
+                    block = True
+            if win:
+                wins.append(move)
+            if block:
+                blocks.append(move)
+        return Tactics(moves, wins, blocks)
+
+    def target_cell(self, move):
+        row = move >> 1
+        col = self.right[row] if move & 1 else self.left[row]
+        return row * COLS + col
+
+    def play(self, move, symbol):
+        row = move >> 1
+        lo = self.left[row]
+        hi = self.right[row]
+        if lo > hi:
+            return -1
+        if move & 1:
+            col = hi
+            self.right[row] = hi - 1
+        else:
+            col = lo
+            self.left[row] = lo + 1
+        cell = row * COLS + col
+        windows = self.windows
+        score = self.score
+        if symbol == 'x':
+            self.x |= 1 << cell
+            self.key ^= ZOBRIST_X[cell]
+            self.mirror_key ^= MIRROR_ZOBRIST_X[cell]
+            for w in CELL_WINDOWS[cell]:
+                code = windows[w]
+                score += DELTA_X[code]
+                windows[w] = code + 5
+        else:
+            self.o |= 1 << cell
+            self.key ^= ZOBRIST_O[cell]
+            self.mirror_key ^= MIRROR_ZOBRIST_O[cell]
+            for w in CELL_WINDOWS[cell]:
+                code = windows[w]
+                score += DELTA_O[code]
+                windows[w] = code + 1
+        self.score = score
+        self.count += 1
+        self.history.append(move)
+        return cell
+
+    def undo(self):
+        move = self.history.pop()
+        row = move >> 1
+        if move & 1:
+            col = self.right[row] + 1
+            self.right[row] = col
+        else:
+            col = self.left[row] - 1
+            self.left[row] = col
+        cell = row * COLS + col
+        bit = 1 << cell
+        windows = self.windows
+        score = self.score
+        if self.x & bit:
+            self.x ^= bit
+            self.key ^= ZOBRIST_X[cell]
+            self.mirror_key ^= MIRROR_ZOBRIST_X[cell]
+            for w in CELL_WINDOWS[cell]:
+                code = windows[w] - 5
+                score -= DELTA_X[code]
+                windows[w] = code
+        else:
+            self.o ^= bit
+            self.key ^= ZOBRIST_O[cell]
+            self.mirror_key ^= MIRROR_ZOBRIST_O[cell]
+            for w in CELL_WINDOWS[cell]:
+                code = windows[w] - 1
+                score -= DELTA_O[code]
+                windows[w] = code
+        self.score = score
+        self.count -= 1
+
+    def is_full(self):
+        return (self.x | self.o) == FULL
+
+    def has_won(self, symbol):
+        return has_four(self.x if symbol == 'x' else self.o)
+
+    def evaluate(self, symbol):
+        return self.score if symbol == 'x' else -self.score
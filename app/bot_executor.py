@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from .bitboard import BitBoard, CELLS
+from .game_logic import bot_search, search_bot_move, MEDIUM_BOT_DEPTH, HARD_BOT_TIME_BUDGET
+from .search import SearchResult, search
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+DIFFICULTIES = ('easy_bot', 'medium_bot', 'hard_bot')
+
+BOT_POOL_SIZE = int(os.getenv("BOT_POOL_SIZE", str(multiprocessing.cpu_count())))
+BOT_QUEUE_DEPTH = int(os.getenv("BOT_QUEUE_DEPTH", str(BOT_POOL_SIZE * 4)))
+BOT_SEARCH_TIMEOUT = float(os.getenv("BOT_SEARCH_TIMEOUT", str(HARD_BOT_TIME_BUDGET + 1.0)))
+# Search budget (depth, time budget) used when analysis asks for a difficulty.
+ANALYSIS_BUDGETS = {
+    'easy_bot': (1, None),
+    'medium_bot': (MEDIUM_BOT_DEPTH, None),
+    'hard_bot': (CELLS, HARD_BOT_TIME_BUDGET),
+}
+# Offline analysis runs on its own pool so it never holds up interactive bot
+# moves, and no analysis search runs for longer than the cap.
+ANALYSIS_POOL_SIZE = int(os.getenv("ANALYSIS_POOL_SIZE", str(max(1, BOT_POOL_SIZE // 2))))
+ANALYSIS_MAX_TIME_BUDGET = float(os.getenv("ANALYSIS_MAX_TIME_BUDGET", "10.0"))
+# Depth of the inline search used when a worker misses its deadline.
+BOT_FALLBACK_DEPTH = int(os.getenv("BOT_FALLBACK_DEPTH", "2"))
+
+
+class BotBusy(Exception):
+    pass
+
+
+def _run_search(x, o, bot_symbol, difficulty, time_budget):
+    # Runs in a worker process; the board travels as two packed integers.
+    return bot_search(BitBoard.from_bits(x, o), bot_symbol, difficulty, time_budget)
+
+
+def _run_analysis(x, o, symbol, depth, time_budget):
+    return search(BitBoard.from_bits(x, o), symbol, depth, time_budget)
+
+
+class BotExecutor:
+    """Runs bot searches in a process pool so they never block the event loop.
+
+    At most ``queue_depth`` searches may be queued or running at once; beyond
+    that ``BotBusy`` is raised. A search that misses ``timeout`` is abandoned
+    and answered with a shallow inline search instead. Analysis searches run
+    on a separate pool of ``analysis_pool_size`` workers, one per worker at a
+    time across all requests.
+    """
+
+    def __init__(self, pool_size=BOT_POOL_SIZE, queue_depth=BOT_QUEUE_DEPTH, timeout=BOT_SEARCH_TIMEOUT,
+                 analysis_pool_size=ANALYSIS_POOL_SIZE):
+        self.pool_size = max(1, pool_size)
+        self.queue_depth = queue_depth
+        self.timeout = timeout
+        self.analysis_pool_size = max(1, analysis_pool_size)
+        self.pending = 0
+        self.pondering = 0
+        self.analyzing = 0
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._analysis_pool: Optional[ProcessPoolExecutor] = None
+        self._analysis_slots = asyncio.Semaphore(self.analysis_pool_size)
+
+    def start(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.pool_size)
+        if self._analysis_pool is None:
+            self._analysis_pool = ProcessPoolExecutor(max_workers=self.analysis_pool_size)
+
+    def _time_budget(self):
+        # Keep the worker's own budget inside the timeout so it frees up in time.
+        return min(HARD_BOT_TIME_BUDGET, self.timeout * 0.8)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+        if self._analysis_pool is not None:
+            self._analysis_pool.shutdown(wait=False, cancel_futures=True)
+            self._analysis_pool = None
+
+    async def search(self, board, bot_symbol, difficulty) -> Optional[SearchResult]:
+        if difficulty not in DIFFICULTIES:
+            return None
+        if self.pending >= self.queue_depth:
+            raise BotBusy()
+        self.start()
+
+        bb = board if isinstance(board, BitBoard) else BitBoard.from_board(board)
+        time_budget = self._time_budget()
+        # Ponder searches only start on idle workers, so a search queued behind
+        # them waits for at most one of their budgets; don't count that against it.
+        timeout = self.timeout + (time_budget if self.pondering else 0)
+        loop = asyncio.get_running_loop()
+        self.pending += 1
+        start = time.perf_counter()
+        try:
+            future = loop.run_in_executor(
+                self._pool, _run_search, bb.x, bb.o, bot_symbol, difficulty, time_budget)
+            result = await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            logger.warning("%s search timed out after %.1fs, falling back to depth %d",
+                           difficulty, timeout, BOT_FALLBACK_DEPTH)
+            result = search_bot_move(bb, bot_symbol, BOT_FALLBACK_DEPTH)
+        finally:
+            self.pending -= 1
+        if metrics.METRICS_ENABLED:
+            metrics.observe_search(difficulty, result, time.perf_counter() - start)
+        return result
+
+    async def analyze(self, board, symbol, depth=None, time_budget=None) -> SearchResult:
+        # Offline analysis is bounded by its own time budget rather than the
+        # interactive timeout, and does not count against the queue depth.
+        # Searches wait here for a free analysis worker rather than in the
+        # pool's queue, so cancelling a request drops its waiting searches.
+        self.start()
+        bb = board if isinstance(board, BitBoard) else BitBoard.from_board(board)
+        if depth is None:
+            depth = CELLS
+        time_budget = min(time_budget or HARD_BOT_TIME_BUDGET, ANALYSIS_MAX_TIME_BUDGET)
+        loop = asyncio.get_running_loop()
+        async with self._analysis_slots:
+            self.analyzing += 1
+            try:
+                return await loop.run_in_executor(
+                    self._analysis_pool, _run_analysis, bb.x, bb.o, symbol, depth, time_budget)
+            finally:
+                self.analyzing -= 1
+
+    def ponder(self, x, o, bot_symbol, difficulty) -> "asyncio.Future[SearchResult]":
+        # A search ahead of time for app.ponder, which limits how many run; it
+        # neither counts against the queue depth nor falls back on timeout.
+        # Cancelling the returned future does not stop a search already running
+        # in a worker, so ``pondering`` counts pool jobs until they finish.
+        self.start()
+        loop = asyncio.get_running_loop()
+        job = self._pool.submit(_run_search, x, o, bot_symbol, difficulty, self._time_budget())
+        self.pondering += 1
+        job.add_done_callback(lambda _: self._call_soon(loop, self._ponder_done))
+        return asyncio.wrap_future(job, loop=loop)
+
+    def _ponder_done(self):
+        self.pondering -= 1
+
+    @staticmethod
+    def _call_soon(loop, callback):
+        try:
+            loop.call_soon_threadsafe(callback)
+        except RuntimeError:  # the loop closed at shutdown
+            pass
+
+
+bot_executor = BotExecutor()
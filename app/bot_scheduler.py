@@ -0,0 +1,112 @@
+import asyncio
+import logging
+import os
+from typing import List, Optional, Set
+from uuid import UUID
+
+from . import async_crud, game_service, models
+from .bot_executor import bot_executor, BotBusy, DIFFICULTIES
+from .database import AsyncSessionLocal, advisory_lock
+from .events import event_bus, GAME_CHANNEL, WORKER_ID
+from .game_store import game_store, ActiveGame
+
+logger = logging.getLogger(__name__)
+
+# Off by default: clients that ask for bot moves through the bot_move route
+# would otherwise get every bot turn searched twice.
+BOT_SCHEDULER_ENABLED = os.getenv("BOT_SCHEDULER_ENABLED", "false").lower() in ("1", "true", "yes")
+BOT_SCHEDULER_CONCURRENCY = int(os.getenv("BOT_SCHEDULER_CONCURRENCY", str(bot_executor.pool_size)))
+BOT_SCHEDULER_RETRY_DELAY = float(os.getenv("BOT_SCHEDULER_RETRY_DELAY", "0.5"))
+# Look for games waiting on a bot at startup; with several workers, whichever
+# gets the advisory lock first scans.
+BOT_SCHEDULER_SCAN = os.getenv("BOT_SCHEDULER_SCAN", "true").lower() in ("1", "true", "yes")
+BOT_SCHEDULER_SCAN_LOCK_KEY = 0x5151_0018
+
+
+def bot_to_move(game: ActiveGame) -> Optional[str]:
+    # The difficulty of the player whose turn it is, or None for a human or a finished game.
+    if game.status != 'in_progress':
+        return None
+    player = game.player_1 if game.current_turn == 'x' else game.player_2
+    return player.type.value if player.type.value in DIFFICULTIES else None
+
+
+class BotScheduler:
+    """Plays bot turns on the server, without a client asking for them.
+
+    Games are queued when a move made on this worker, or the game's creation,
+    leaves a bot to move. A fixed number of worker tasks take games in FIFO
+    order and play them through the same path as the bot_move route, so at
+    most ``concurrency`` searches from here are in flight at once. Each bot
+    move publishes an update, which queues the game again in bot-vs-bot play.
+    """
+
+    def __init__(self, concurrency=BOT_SCHEDULER_CONCURRENCY):
+        self.concurrency = concurrency
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.scheduled: Set[UUID] = set()
+        self._workers: List[asyncio.Task] = []
+
+    def notify(self, game: ActiveGame):
+        if self._workers and game.id not in self.scheduled and bot_to_move(game):
+            self.scheduled.add(game.id)
+            self.queue.put_nowait(game.id)
+
+    def _on_game_event(self, event):
+        # Only the worker that applied a move schedules the reply to it.
+        if event["type"] == "update" and event["origin"] == WORKER_ID:
+            game = game_store.games.get(UUID(event["game_id"]))
+            if game is not None:
+                self.notify(game)
+
+    async def _play(self, game_id):
+        game = await game_store.get(game_id)
+        if game is None:
+            return
+        difficulty = bot_to_move(game)
+        if difficulty:
+            await game_service.submit_bot_move(game_id, difficulty)
+
+    async def _worker(self):
+        while True:
+            game_id = await self.queue.get()
+            self.scheduled.discard(game_id)
+            try:
+                await self._play(game_id)
+            except BotBusy:
+                await asyncio.sleep(BOT_SCHEDULER_RETRY_DELAY)
+                game = game_store.games.get(game_id)
+                if game is not None:
+                    self.notify(game)
+            except Exception:
+                logger.exception("Scheduled bot move failed for game %s", game_id)
+
+    async def scan(self):
+        async with advisory_lock(BOT_SCHEDULER_SCAN_LOCK_KEY) as locked:
+            if not locked:
+                return
+            async with AsyncSessionLocal() as db:
+                game_ids = await async_crud.list_bot_turn_game_ids(
+                    db, [models.PlayerType(difficulty) for difficulty in DIFFICULTIES])
+        for game_id in game_ids:
+            game = await game_store.get(game_id)
+            if game is not None:
+                self.notify(game)
+        if game_ids:
+            logger.info("Scheduled %d games waiting on a bot", len(game_ids))
+
+    async def start(self):
+        if BOT_SCHEDULER_ENABLED and not self._workers:
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+            if BOT_SCHEDULER_SCAN:
+                await self.scan()
+
+    async def stop(self):
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+
+bot_scheduler = BotScheduler()
+event_bus.subscribe(GAME_CHANNEL, bot_scheduler._on_game_event)
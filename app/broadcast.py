@@ -0,0 +1,126 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Callable, Dict
+from uuid import UUID
+
+from fastapi import WebSocket
+
+from . import metrics
+from .wire import FULL_JSON, Message, WireFormat
+
+logger = logging.getLogger(__name__)
+
+BROADCAST_QUEUE_SIZE = int(os.getenv("BROADCAST_QUEUE_SIZE", "32"))
+BROADCAST_SEND_TIMEOUT = float(os.getenv("BROADCAST_SEND_TIMEOUT", "5.0"))
+
+# Close code sent to a consumer that fell too far behind (1013 = try again later).
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+
+class _Subscriber:
+    __slots__ = ("websocket", "format", "queue", "task")
+
+    def __init__(self, websocket: WebSocket, fmt: WireFormat, queue_size: int):
+        self.websocket = websocket
+        self.format = fmt
+        self.queue: asyncio.Queue = asyncio.Queue(queue_size)
+        self.task = None
+
+
+class Broadcaster:
+    """Fans game updates out to WebSocket spectators.
+
+    Every connection gets a bounded send queue drained by its own writer
+    task, so publishing never waits on a socket. A connection whose queue is
+    full, or whose send takes longer than ``send_timeout``, is dropped and
+    closed instead of holding up everyone else.
+
+    Each connection chooses a wire format; a published update is encoded
+    once per format in use, not once per connection.
+    """
+
+    def __init__(self, queue_size=BROADCAST_QUEUE_SIZE, send_timeout=BROADCAST_SEND_TIMEOUT):
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        self.games: Dict[UUID, Dict[WebSocket, _Subscriber]] = {}
+
+    def subscribe(self, game_id: UUID, websocket: WebSocket, fmt: WireFormat = FULL_JSON):
+        subscriber = _Subscriber(websocket, fmt, self.queue_size)
+        subscriber.task = asyncio.create_task(self._writer(game_id, subscriber))
+        self.games.setdefault(game_id, {})[websocket] = subscriber
+
+    def unsubscribe(self, game_id: UUID, websocket: WebSocket):
+        subscriber = self._remove(game_id, websocket)
+        if subscriber:
+            subscriber.task.cancel()
+
+    def publish(self, game_id: UUID, render: Callable[[WireFormat], Message]):
+        start = time.perf_counter()
+        encoded: Dict[WireFormat, Message] = {}
+        for subscriber in list(self.games.get(game_id, {}).values()):
+            message = encoded.get(subscriber.format)
+            if message is None:
+                message = encoded[subscriber.format] = render(subscriber.format)
+            self._enqueue(game_id, subscriber, message)
+        if metrics.METRICS_ENABLED:
+            metrics.WS_FANOUT_SECONDS.observe(time.perf_counter() - start)
+
+    def _enqueue(self, game_id, subscriber, message):
+        try:
+            subscriber.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            logger.warning("Dropping slow WebSocket consumer of game %s", game_id)
+            metrics.WS_SEND_FAILURES.inc(reason="slow_consumer")
+            self.unsubscribe(game_id, subscriber.websocket)
+            asyncio.create_task(self._close(subscriber.websocket))
+
+    def send(self, game_id: UUID, websocket: WebSocket, message: Message):
+        # Queues a message for one connection, in order with its broadcasts.
+        subscriber = self.games.get(game_id, {}).get(websocket)
+        if subscriber is not None:
+            self._enqueue(game_id, subscriber, message)
+
+    def connection_count(self, game_id: UUID) -> int:
+        return len(self.games.get(game_id, ()))
+
+    def total_connections(self) -> int:
+        return sum(len(subscribers) for subscribers in self.games.values())
+
+    def _remove(self, game_id, websocket):
+        subscribers = self.games.get(game_id)
+        if not subscribers:
+            return None
+        subscriber = subscribers.pop(websocket, None)
+        if not subscribers:
+            del self.games[game_id]
+        return subscriber
+
+    async def _writer(self, game_id, subscriber):
+        try:
+            while True:
+                message = await subscriber.queue.get()
+                if isinstance(message, bytes):
+                    send = subscriber.websocket.send_bytes(message)
+                else:
+                    send = subscriber.websocket.send_text(message)
+                await asyncio.wait_for(send, self.send_timeout)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Send failed or timed out; stop delivering to this socket.
+            metrics.WS_SEND_FAILURES.inc(reason="timeout" if isinstance(e, asyncio.TimeoutError) else "error")
+            self._remove(game_id, subscriber.websocket)
+            await self._close(subscriber.websocket)
+
+    @staticmethod
+    async def _close(websocket):
+        try:
+            await websocket.close(code=SLOW_CONSUMER_CLOSE_CODE)
+        except Exception:
+            pass
+
+
+broadcaster = Broadcaster()
+metrics.WS_CONNECTIONS.set_function(broadcaster.total_connections)
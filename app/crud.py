@@ -1,10 +1,12 @@
 import uuid
 import random
 import time
-from sqlalchemy.orm import Session
-from sqlalchemy.orm.attributes import flag_modified
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import delete, or_, tuple_
+from sqlalchemy.orm import Session, joinedload, defer
 from . import models, schemas
-from .game_logic import initial_board, apply_move, check_winner, board_full, easy_bot_move, medium_bot_move, hard_bot_move
+from .game_logic import initial_board, play_turn, easy_bot_move, medium_bot_move, hard_bot_move
 
 def create_player(db: Session, player: schemas.PlayerCreate) -> models.Player:
     db_player = models.Player(nickname=player.nickname, type=player.type)
@@ -44,21 +46,34 @@ def get_game(db: Session, game_id: uuid.UUID) -> models.Game:
 def get_all_games(db: Session) -> list[models.Game]:
     return db.query(models.Game).all()
 
+def list_games(db: Session, limit: int, after: Optional[tuple[datetime, uuid.UUID]] = None,
+               status: Optional[str] = None, player_id: Optional[uuid.UUID] = None,
+               summary: bool = False) -> list[models.Game]:
+    # Newest first, paging with a (created_at, id) keyset instead of OFFSET.
+    query = db.query(models.Game).options(
+        joinedload(models.Game.player_1), joinedload(models.Game.player_2))
+    if summary:
+        query = query.options(
+            defer(models.Game.board_x), defer(models.Game.board_o), defer(models.Game.board_json))
+    if status:
+        query = query.filter(models.Game.status == status)
+    if player_id:
+        query = query.filter(or_(models.Game.player_1_id == player_id, models.Game.player_2_id == player_id))
+    if after:
+        query = query.filter(tuple_(models.Game.created_at, models.Game.id) < tuple_(*after))
+    return query.order_by(models.Game.created_at.desc(), models.Game.id.desc()).limit(limit).all()
+
 def get_all_players(db: Session) -> list[models.Player]:
     return db.query(models.Player).all()
 
 def delete_game(db: Session, game_id: uuid.UUID):
-    game = db.query(models.Game).filter(models.Game.id == game_id).first()
-    if game:
+    players = (db.query(models.Game.player_1_id, models.Game.player_2_id)
+               .filter(models.Game.id == game_id).first())
+    if players:
+        db.execute(delete(models.GameMove).where(models.GameMove.game_id == game_id))
+        db.execute(delete(models.Game).where(models.Game.id == game_id))
         # Delete associated players
-        player1 = db.query(models.Player).filter(models.Player.id == game.player_1_id).first()
-        player2 = db.query(models.Player).filter(models.Player.id == game.player_2_id).first()
-        if player1:
-            db.delete(player1)
-        if player2:
-            db.delete(player2)
-
-        db.delete(game)
+        db.execute(delete(models.Player).where(models.Player.id.in_(set(players))))
         db.commit()
 
 
@@ -71,20 +86,14 @@ def make_move(db: Session, game_id: uuid.UUID, move: schemas.Move) -> models.Gam
         return game
 
     board = game.board
-    symbol = move.player
-    success = apply_move(board, move.row, move.side, symbol)
-    if not success:
+    ply = sum(cell != '_' for row in board for cell in row)
+    outcome = play_turn(board, move.row, move.side, move.player)
+    if not outcome:
         return game
 
-    if check_winner(board, symbol):
-        game.status = f"{symbol}_won"
-    elif board_full(board):
-        game.status = "draw"
-    else:
-        game.current_turn = 'o' if symbol == 'x' else 'x'
-
+    game.status, game.current_turn = outcome
     game.board = board
-    flag_modified(game, "board")
+    db.add(models.GameMove(game_id=game.id, ply=ply, row=move.row, side=move.side))
     db.commit()
     db.refresh(game)
     return game
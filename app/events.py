@@ -0,0 +1,133 @@
+import asyncio
+import json
+import logging
+import os
+import uuid
+from collections import defaultdict
+from typing import Callable, Dict, List
+
+from sqlalchemy.engine import make_url
+
+from .database import DATABASE_URL
+
+logger = logging.getLogger(__name__)
+
+EVENT_BUS = os.getenv("EVENT_BUS", "memory")  # "memory" or "postgres"
+
+GAME_CHANNEL = "game_updates"
+MATCHMAKING_CHANNEL = "matchmaking"
+CHANNELS = (GAME_CHANNEL, MATCHMAKING_CHANNEL)
+
+# Identifies this server process in events, so it can tell its own from others'.
+WORKER_ID = uuid.uuid4().hex
+
+
+class EventBus:
+    """Publish/subscribe for events that every server process must see.
+
+    Handlers receive the event dict and run on the event loop of the
+    receiving process, including the one that published it.
+    """
+
+    def __init__(self):
+        self.handlers: Dict[str, List[Callable[[dict], None]]] = defaultdict(list)
+
+    def subscribe(self, channel: str, handler: Callable[[dict], None]):
+        self.handlers[channel].append(handler)
+
+    async def publish(self, channel: str, event: dict):
+        raise NotImplementedError
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    def _dispatch(self, channel, event):
+        for handler in self.handlers.get(channel, ()):
+            try:
+                handler(event)
+            except Exception:
+                logger.exception("Event handler failed on %s", channel)
+
+
+class InMemoryEventBus(EventBus):
+    """Delivers events within this process only; fine for a single worker."""
+
+    async def publish(self, channel: str, event: dict):
+        self._dispatch(channel, event)
+
+
+class PostgresEventBus(EventBus):
+    """Delivers events to every process through Postgres LISTEN/NOTIFY.
+
+    NOTIFY payloads are limited to 8000 bytes, which comfortably fits a game
+    state. Publishing uses a small connection pool; listening holds one
+    dedicated connection that is re-established if it drops.
+    """
+
+    def __init__(self, dsn):
+        super().__init__()
+        self.dsn = dsn
+        self._listener = None
+        self._pool = None
+        self._stopping = False
+
+    async def start(self):
+        import asyncpg
+
+        self._stopping = False
+        self._pool = await asyncpg.create_pool(self.dsn, min_size=1, max_size=4)
+        await self._listen()
+
+    async def _listen(self):
+        import asyncpg
+
+        self._listener = await asyncpg.connect(self.dsn)
+        for channel in CHANNELS:
+            await self._listener.add_listener(channel, self._on_notify)
+        self._listener.add_termination_listener(self._on_terminated)
+
+    def _on_notify(self, connection, pid, channel, payload):
+        self._dispatch(channel, json.loads(payload))
+
+    def _on_terminated(self, connection):
+        if not self._stopping:
+            logger.warning("Event bus listener connection lost, reconnecting")
+            asyncio.get_running_loop().create_task(self._reconnect())
+
+    async def _reconnect(self):
+        delay = 0.5
+        while not self._stopping:
+            try:
+                await self._listen()
+                return
+            except Exception:
+                logger.exception("Event bus reconnect failed")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 10)
+
+    async def publish(self, channel: str, event: dict):
+        await self._pool.execute("SELECT pg_notify($1, $2)", channel, json.dumps(event))
+
+    async def stop(self):
+        self._stopping = True
+        if self._listener is not None:
+            await self._listener.close()
+            self._listener = None
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+
+def create_event_bus(kind=EVENT_BUS) -> EventBus:
+    if kind == "postgres":
+        dsn = make_url(DATABASE_URL).set(drivername="postgresql").render_as_string(hide_password=False)
+        return PostgresEventBus(dsn)
+    if kind == "memory":
+        return InMemoryEventBus()
+    raise ValueError(f"Unknown EVENT_BUS {kind!r}")
+
+
+event_bus = create_event_bus()
@@ -1,7 +1,16 @@
+import os
 import random
-import copy
-ROWS = 7
-COLS = 7
+import logging
+from typing import Optional
+import numpy as np
+from .bitboard import BitBoard, ROWS, COLS, CELLS, MOVES, WINDOWS, decode_move, other
+from .search import search, SearchResult
+from .opening_book import get_book
+
+logger = logging.getLogger(__name__)
+
+MEDIUM_BOT_DEPTH = 4
+HARD_BOT_TIME_BUDGET = float(os.getenv("HARD_BOT_TIME_BUDGET", "2.0"))
 
 def initial_board():
     return [["_" for _ in range(COLS)] for _ in range(ROWS)]
@@ -20,50 +29,39 @@ def apply_move(board, row, side, symbol):
     return False
 
 def check_winner(board, symbol):
-    for r in range(ROWS):
-        for c in range(COLS):
-            if c + 3 < COLS and all(board[r][c+i] == symbol for i in range(4)):
-                return True
-            if r + 3 < ROWS and all(board[r+i][c] == symbol for i in range(4)):
-                return True
-            if r + 3 < ROWS and c + 3 < COLS and all(board[r+i][c+i] == symbol for i in range(4)):
-                return True
-            if r + 3 < ROWS and c - 3 >= 0 and all(board[r+i][c-i] == symbol for i in range(4)):
-                return True
-    return False
+    return BitBoard.from_board(board).has_won(symbol)
 
 def board_full(board):
     return all(cell != '_' for row in board for cell in row)
 
+def play_turn(board, row, side, symbol):
+    # Returns the (status, current_turn) after the move, or None if it is illegal.
+    if not 0 <= row < ROWS or not apply_move(board, row, side, symbol):
+        return None
+    if check_winner(board, symbol):
+        return f"{symbol}_won", symbol
+    if board_full(board):
+        return "draw", symbol
+    return "in_progress", other(symbol)
+
 
 def check_blocking_move(board, bot_symbol):
-    opponent_symbol = 'o' if bot_symbol == 'x' else 'x'
-    for row in range(ROWS):
-        for side in ['L', 'R']:
-            temp_board = copy.deepcopy(board)
-            if apply_move(temp_board, row, side, opponent_symbol):
-                if check_winner(temp_board, opponent_symbol):
-                    return (row, side)
-    return None
+    bb = board if isinstance(board, BitBoard) else BitBoard.from_board(board)
+    blocks = bb.tactics(bot_symbol).blocks
+    return decode_move(blocks[0]) if blocks else None
 
 def easy_bot_move(board, bot_symbol):
+    bb = board if isinstance(board, BitBoard) else BitBoard.from_board(board)
+    tactics = bb.tactics(bot_symbol)
     # Check for immediate threat to block
-    opponent_symbol = 'o' if bot_symbol == 'x' else 'x'
-    blocking_move = check_blocking_move(board, bot_symbol)
-    if blocking_move:
-        return blocking_move
-    
-    winning_move = check_blocking_move(board, opponent_symbol)
-    if winning_move:
-        return winning_move
+    if tactics.blocks:
+        return decode_move(tactics.blocks[0])
+
+    if tactics.wins:
+        return decode_move(tactics.wins[0])
 
     # Otherwise make a random valid move
-    valid_moves = []
-    for row in range(ROWS):
-        for side in ['L', 'R']:
-            temp = copy.deepcopy(board)
-            if apply_move(temp, row, side, bot_symbol):
-                valid_moves.append((row, side))
+    valid_moves = [decode_move(move) for move in tactics.moves]
     return random.choice(valid_moves) if valid_moves else None
 
 ### MINIMAX ###
@@ -82,99 +80,183 @@ def score_window(window, bot_symbol, opponent_symbol):
 
 
 def evaluate_board(board, bot_symbol):
-    opponent_symbol = 'o' if bot_symbol == 'x' else 'x'
-    score = 0
-
-    # Horizontal
-    for r in range(ROWS):
-        for c in range(COLS - 3):
-            window = [board[r][c+i] for i in range(4)]
-            score += score_window(window, bot_symbol, opponent_symbol)
-
-    # Vertical
-    for c in range(COLS):
-        for r in range(ROWS - 3):
-            window = [board[r+i][c] for i in range(4)]
-            score += score_window(window, bot_symbol, opponent_symbol)
-
-    # Diagonal ↘
-    for r in range(ROWS - 3):
-        for c in range(COLS - 3):
-            window = [board[r+i][c+i] for i in range(4)]
-            score += score_window(window, bot_symbol, opponent_symbol)
-
-    # Diagonal ↙
-    for r in range(ROWS - 3):
-        for c in range(3, COLS):
-            window = [board[r+i][c-i] for i in range(4)]
-            score += score_window(window, bot_symbol, opponent_symbol)
-
-    return score
+    bb = board if isinstance(board, BitBoard) else BitBoard.from_board(board)
+    return bb.evaluate(bot_symbol)
 
 def minimax_smart(board, depth, maximizing, bot_symbol, alpha=float('-inf'), beta=float('inf')):
-    opponent_symbol = 'o' if bot_symbol == 'x' else 'x'
+    bb = board if isinstance(board, BitBoard) else BitBoard.from_board(board)
+    return _minimax(bb, depth, maximizing, bot_symbol, other(bot_symbol), alpha, beta)
 
-    # if check_winner(board, bot_symbol):
+def _minimax(bb, depth, maximizing, bot_symbol, opponent_symbol, alpha, beta):
+    # if bb.has_won(bot_symbol):
     #     return 10000
-    # if check_winner(board, opponent_symbol):
+    # if bb.has_won(opponent_symbol):
     #     return -100000
-    if board_full(board) or depth == 0:
-        return evaluate_board(board, bot_symbol)
+    if depth == 0 or bb.is_full():
+        return bb.evaluate(bot_symbol)
 
     if maximizing:
         max_eval = float('-inf')
-        for row in range(ROWS):
-            for side in ['L', 'R']:
-                temp_board = copy.deepcopy(board)
-                if apply_move(temp_board, row, side, bot_symbol):
-                    eval = minimax_smart(temp_board, depth - 1, False, bot_symbol, alpha, beta)
-                    max_eval = max(max_eval, eval)
-                    alpha = max(alpha, eval)
-                    if beta <= alpha:
-                        break  # Beta cut-off
+        for move in MOVES:
+            if bb.play(move, bot_symbol) >= 0:
+                eval = _minimax(bb, depth - 1, False, bot_symbol, opponent_symbol, alpha, beta)
+                bb.undo()
+                max_eval = max(max_eval, eval)
+                alpha = max(alpha, eval)
+                if beta <= alpha:
+                    break  # Beta cut-off
         return max_eval
 
     else:
         min_eval = float('inf')
-        for row in range(ROWS):
-            for side in ['L', 'R']:
-                temp_board = copy.deepcopy(board)
-                if apply_move(temp_board, row, side, opponent_symbol):
-                    eval = minimax_smart(temp_board, depth - 1, True, bot_symbol, alpha, beta)
-                    min_eval = min(min_eval, eval)
-                    beta = min(beta, eval)
-                    if beta <= alpha:
-                        break  # Alpha cut-off
+        for move in MOVES:
+            if bb.play(move, opponent_symbol) >= 0:
+                eval = _minimax(bb, depth - 1, True, bot_symbol, opponent_symbol, alpha, beta)
+                bb.undo()
+                min_eval = min(min_eval, eval)
+                beta = min(beta, eval)
+                if beta <= alpha:
+                    break  # Alpha cut-off
         return min_eval
 
 
-def medium_bot_move(board, bot_symbol, depth=4):
-    best_score = float('-inf')
-    best_move = None
-    opponent_symbol = 'o' if bot_symbol == 'x' else 'x'
+def search_bot_move(board, bot_symbol, max_depth, time_budget=None, tt=None) -> SearchResult:
+    bb = board if isinstance(board, BitBoard) else BitBoard.from_board(board)
+    tactics = bb.tactics(bot_symbol)
     # First, check if we must block a win
-    blocking_move = check_blocking_move(board, bot_symbol)
-    if blocking_move:
-        print("🚨 Blocking move detected:", blocking_move)
-        return blocking_move
-    
-    winning_move = check_blocking_move(board, opponent_symbol)
-    if winning_move:
-        print("🚨 Winning move detected:", winning_move)
-        return winning_move
-
-    for row in range(ROWS):
-        for side in ['L', 'R']:
-            temp_board = copy.deepcopy(board)
-            if apply_move(temp_board, row, side, bot_symbol):
-                score = minimax_smart(temp_board, depth - 1, False, bot_symbol)
-                if score > best_score:
-                    best_score = score
-                    best_move = (row, side)
-
-    return best_move
+    if tactics.blocks:
+        blocking_move = decode_move(tactics.blocks[0])
+        logger.debug("Blocking move detected: %s", blocking_move)
+        return SearchResult(move=blocking_move, score=0, depth=0, nodes=0, elapsed=0.0, pv=[blocking_move])
+
+    if tactics.wins:
+        winning_move = decode_move(tactics.wins[0])
+        logger.debug("Winning move detected: %s", winning_move)
+        return SearchResult(move=winning_move, score=0, depth=0, nodes=0, elapsed=0.0, pv=[winning_move])
+
+    book = get_book()
+    booked = book.lookup(bb, bot_symbol) if book is not None else None
+    if booked is not None:
+        return booked
+
+    result = search(bb, bot_symbol, max_depth, time_budget, tt)
+    logger.info("search %s: move=%s score=%d depth=%d nodes=%d time=%.3fs",
+                bot_symbol, result.move, result.score, result.depth, result.nodes, result.elapsed)
+    return result
+
+
+def medium_bot_move(board, bot_symbol, depth=MEDIUM_BOT_DEPTH):
+    return search_bot_move(board, bot_symbol, depth).move
 
 ### END MINIMAX ###
 
-def hard_bot_move(board, bot_symbol):
-    return medium_bot_move(board, bot_symbol)
\ No newline at end of file
+def hard_bot_move(board, bot_symbol, time_budget=None):
+    if time_budget is None:
+        time_budget = HARD_BOT_TIME_BUDGET
+    return search_bot_move(board, bot_symbol, CELLS, time_budget).move
+
+
+def bot_search(board, bot_symbol, difficulty, time_budget=None) -> Optional[SearchResult]:
+    if difficulty == 'easy_bot':
+        move = easy_bot_move(board, bot_symbol)
+        return SearchResult(move=move, score=0, depth=0, nodes=0, elapsed=0.0, pv=[move] if move else [])
+    elif difficulty == 'medium_bot':
+        return search_bot_move(board, bot_symbol, MEDIUM_BOT_DEPTH)
+    elif difficulty == 'hard_bot':
+        if time_budget is None:
+            time_budget = HARD_BOT_TIME_BUDGET
+        return search_bot_move(board, bot_symbol, CELLS, time_budget)
+    else:
+        return None
+
+
+### BATCH (NumPy) ###
+# Batches are (N, ROWS, COLS) int8 arrays with these cell values.
+EMPTY_CELL, X_CELL, O_CELL = 0, 1, -1
+_CELL_VALUES = {'_': EMPTY_CELL, 'x': X_CELL, 'o': O_CELL}
+_CELL_SYMBOLS = {EMPTY_CELL: '_', X_CELL: 'x', O_CELL: 'o'}
+
+# (n_windows, 4) flat cell indices of every 4-cell line.
+_WINDOW_INDEX = np.array(
+    [[cell for cell in range(CELLS) if w >> cell & 1] for w in WINDOWS], dtype=np.intp)
+# Window score from x's point of view, indexed by [x_count, o_count].
+_WINDOW_SCORE = np.array(
+    [[x if x and not o else -o if o and not x else 0 for o in range(5)] for x in range(5)],
+    dtype=np.int32)
+
+
+def _as_batch(boards):
+    boards = np.asarray(boards, dtype=np.int8)
+    if boards.ndim != 3 or boards.shape[1:] != (ROWS, COLS):
+        raise ValueError(f"Expected an (N, {ROWS}, {COLS}) array, got {boards.shape}")
+    return boards
+
+
+def boards_to_array(boards):
+    return np.array(
+        [[[_CELL_VALUES[cell] for cell in row] for row in board] for board in boards],
+        dtype=np.int8).reshape(-1, ROWS, COLS)
+
+
+def array_to_boards(boards):
+    return [[[_CELL_SYMBOLS[int(cell)] for cell in row] for row in board]
+            for board in _as_batch(boards)]
+
+
+def _window_counts(boards):
+    windows = boards.reshape(len(boards), CELLS)[:, _WINDOW_INDEX]
+    x_counts = (windows == X_CELL).sum(axis=2)
+    o_counts = (windows == O_CELL).sum(axis=2)
+    return x_counts, o_counts
+
+
+def batch_evaluate(boards, bot_symbol):
+    """Score N boards at once.
+
+    Returns ``(scores, winners)``: the ``evaluate_board`` score of each board
+    for ``bot_symbol``, and 1 / -1 / 0 when the bot / opponent / nobody has
+    four in a row.
+    """
+    boards = _as_batch(boards)
+    x_counts, o_counts = _window_counts(boards)
+    scores = _WINDOW_SCORE[x_counts, o_counts].sum(axis=1, dtype=np.int32)
+    winners = (x_counts == 4).any(axis=1).astype(np.int8) - (o_counts == 4).any(axis=1).astype(np.int8)
+    if bot_symbol != 'x':
+        scores = -scores
+        winners = -winners
+    return scores, winners
+
+
+def batch_check_winner(boards, symbol):
+    boards = _as_batch(boards)
+    value = X_CELL if symbol == 'x' else O_CELL
+    windows = boards.reshape(len(boards), CELLS)[:, _WINDOW_INDEX]
+    return (windows == value).all(axis=2).any(axis=1)
+
+
+def batch_children(boards, symbol):
+    """Expand every legal move of every board in the batch.
+
+    Returns ``(children, parents, moves)`` where ``children[i]`` is
+    ``boards[parents[i]]`` after playing ``moves[i]`` (row, side with
+    0 = 'L' and 1 = 'R'), in the same row/L-R order as ``MOVES``.
+    """
+    boards = _as_batch(boards)
+    empty = boards == EMPTY_CELL
+    open_rows = empty.any(axis=2)
+    left_col = empty.argmax(axis=2)
+    right_col = COLS - 1 - empty[:, :, ::-1].argmax(axis=2)
+
+    # (N, ROWS, 2) -> flattened in move order row * 2 + side.
+    legal = np.repeat(open_rows[:, :, None], 2, axis=2).reshape(len(boards), -1)
+    target_col = np.stack([left_col, right_col], axis=2).reshape(len(boards), -1)
+    parents, move_index = np.nonzero(legal)
+
+    children = boards[parents].copy()
+    rows = move_index >> 1
+    children[np.arange(len(parents)), rows, target_col[parents, move_index]] = (
+        X_CELL if symbol == 'x' else O_CELL)
+    moves = np.stack([rows, move_index & 1], axis=1)
+    return children, parents, moves
+
+### END BATCH ###
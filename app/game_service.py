@@ -0,0 +1,65 @@
+from dataclasses import dataclass
+from typing import Optional
+from uuid import UUID
+
+from . import realtime, schemas
+from .bot_executor import bot_executor
+from .game_store import game_store, ActiveGame
+from .ponder import ponderer
+
+# Move handling shared by the HTTP routes and the game WebSocket.
+
+
+class GameNotFound(Exception):
+    pass
+
+
+class DifficultyNotFound(Exception):
+    pass
+
+
+@dataclass
+class MoveOutcome:
+    game: ActiveGame
+    state: schemas.GameState
+    applied: bool  # False when the move was illegal, out of turn or the game is over
+    version: int  # the game's ply once the move was made
+
+
+async def submit_move(game_id: UUID, move: schemas.Move, expected_ply: Optional[int] = None) -> MoveOutcome:
+    game, applied = await game_store.play(game_id, move, expected_ply)
+    if game is None:
+        raise GameNotFound(game_id)
+    state = game.state()
+    version = game.ply
+    if applied:
+        # Broadcast to WebSocket clients
+        await realtime.publish_game(game, state, move)
+    return MoveOutcome(game=game, state=state, applied=applied, version=version)
+
+
+async def submit_bot_move(game_id: UUID, difficulty: str) -> MoveOutcome:
+    """Compute and play a bot move for whoever's turn it is; may raise BotBusy."""
+    game = await game_store.get(game_id)
+    if game is None:
+        raise GameNotFound(game_id)
+    bot_symbol = game.current_turn
+    ply = game.ply
+    result = await ponderer.take(game_id, game.board, bot_symbol, difficulty)
+    if result is None:
+        result = await bot_executor.search(game.board, bot_symbol, difficulty)
+    if not result or not result.move:
+        raise DifficultyNotFound(difficulty)
+
+    # The move was searched for the position at ``ply``; the store rejects it
+    # if the game moved on meanwhile.
+    move = schemas.Move(player=bot_symbol, row=result.move[0], side=result.move[1])
+    outcome = await submit_move(game_id, move, ply)
+    if outcome.applied and _human_to_move(outcome.game):
+        ponderer.start(outcome.game, difficulty, result.pv[1] if len(result.pv) > 1 else None)
+    return outcome
+
+
+def _human_to_move(game: ActiveGame) -> bool:
+    player = game.player_1 if game.current_turn == 'x' else game.player_2
+    return player.type == schemas.PlayerType.human
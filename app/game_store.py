@@ -0,0 +1,335 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from dataclasses import dataclass, field
+from typing import List, Optional, Set, Tuple
+
+from sqlalchemy.exc import IntegrityError
+
+from . import async_crud, models, schemas
+from .database import AsyncSessionLocal
+from .events import EVENT_BUS
+from .bitboard import BitBoard
+from .game_logic import play_turn
+from .response_cache import state_cache
+
+logger = logging.getLogger(__name__)
+
+GAME_FLUSH_INTERVAL = float(os.getenv("GAME_FLUSH_INTERVAL", "1.0"))
+GAME_FLUSH_BATCH = int(os.getenv("GAME_FLUSH_BATCH", "500"))
+# In-progress games kept in memory; clean ones beyond this, or idle for
+# GAME_STORE_IDLE_TTL seconds, are dropped and reloaded on their next access.
+GAME_STORE_MAX_GAMES = int(os.getenv("GAME_STORE_MAX_GAMES", "10000"))
+GAME_STORE_IDLE_TTL = float(os.getenv("GAME_STORE_IDLE_TTL", "600"))
+# Recently seen finished games, kept read-only so that polling them skips the database.
+GAME_STORE_FINISHED_GAMES = int(os.getenv("GAME_STORE_FINISHED_GAMES", "1000"))
+# Write each move to the database before accepting it. Needed whenever several
+# processes serve the same games, since each keeps its own copy of them.
+GAME_WRITE_THROUGH = os.getenv(
+    "GAME_WRITE_THROUGH", "true" if EVENT_BUS == "postgres" else "false").lower() in ("1", "true", "yes")
+
+
+@dataclass
+class ActiveGame:
+    id: uuid.UUID
+    board: List[List[str]]
+    current_turn: str
+    status: str
+    player_1: schemas.PlayerInfo
+    player_2: schemas.PlayerInfo
+    ply: int = 0
+    # Bumped on every applied move; flushed_version is what the database has.
+    version: int = 0
+    flushed_version: int = 0
+    # Rows for the moves table not written yet.
+    pending_moves: List[dict] = field(default_factory=list, repr=False)
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock, repr=False)
+    last_used: float = field(default_factory=time.monotonic, repr=False)
+
+    @classmethod
+    def from_model(cls, game: models.Game):
+        board = game.board
+        return cls(
+            id=game.id,
+            board=board,
+            current_turn=game.current_turn,
+            status=game.status,
+            ply=sum(cell != '_' for row in board for cell in row),
+            player_1=schemas.PlayerInfo.model_validate(game.player_1),
+            player_2=schemas.PlayerInfo.model_validate(game.player_2),
+        )
+
+    @property
+    def etag(self) -> str:
+        # ply only grows and changes with every move; the status also changes
+        # without a move when the retention sweeper abandons the game.
+        return f'"{self.ply}-{self.status}"'
+
+    def state_json(self) -> bytes:
+        return state_cache.get_or_render(self.id, self.etag, lambda: self.state().model_dump_json().encode())
+
+    def state(self) -> schemas.GameState:
+        return schemas.GameState(
+            id=str(self.id),
+            board=self.board,
+            current_turn=self.current_turn,
+            status=self.status,
+            player_1=self.player_1,
+            player_2=self.player_2,
+        )
+
+
+async def _load_game(game_id):
+    async with AsyncSessionLocal() as db:
+        game = await async_crud.get_game_with_players(db, game_id)
+        return ActiveGame.from_model(game) if game else None
+
+
+async def _save_games(rows, moves):
+    async with AsyncSessionLocal() as db:
+        await async_crud.save_games(db, rows, moves)
+
+
+async def _save_game(row, moves) -> bool:
+    # False when another writer got to the game first.
+    try:
+        async with AsyncSessionLocal() as db:
+            return await async_crud.save_game(db, row, moves)
+    except IntegrityError:
+        return False
+
+
+def _game_row(game_id, board, current_turn, status, now):
+    bb = BitBoard.from_board(board)
+    return {
+        "id": game_id,
+        "board_x": bb.x,
+        "board_o": bb.o,
+        "board_json": None,
+        "current_turn": current_turn,
+        "status": status,
+        "updated_at": now,
+    }
+
+
+class GameStore:
+    """Authoritative in-process state for games being played.
+
+    Games are loaded from the database on first access, so a restarted
+    worker rebuilds its state lazily. Moves are validated and applied in
+    memory under a per-game lock and written back in batches every
+    ``flush_interval`` seconds; a game that ends is written immediately and
+    evicted. A game that fails to flush with its batch is retried on its
+    own, and dropped from memory if another writer changed it meanwhile.
+
+    With ``write_through``, each move is instead written before it is
+    accepted, and only if the stored board is still part of the new one.
+    When another process moved first, the local copy is reloaded and the
+    move judged again, so processes never accept conflicting moves.
+
+    Finished games move to a small read-only LRU of ``max_finished``
+    entries instead of being held with the games in play, and games with
+    nothing left to write are evicted once idle for ``idle_ttl`` seconds or,
+    least recently used first, while more than ``max_games`` are held.
+    """
+
+    def __init__(self, flush_interval=GAME_FLUSH_INTERVAL, flush_batch=GAME_FLUSH_BATCH,
+                 max_games=GAME_STORE_MAX_GAMES, idle_ttl=GAME_STORE_IDLE_TTL,
+                 write_through=GAME_WRITE_THROUGH, max_finished=GAME_STORE_FINISHED_GAMES):
+        self.write_through = write_through
+        self.max_finished = max_finished
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self.max_games = max_games
+        self.idle_ttl = idle_ttl
+        self.games: "OrderedDict[uuid.UUID, ActiveGame]" = OrderedDict()
+        self.finished: "OrderedDict[uuid.UUID, ActiveGame]" = OrderedDict()
+        self.dirty: Set[uuid.UUID] = set()
+        self._flusher: Optional[asyncio.Task] = None
+        # One flush at a time, so an older row of a game can't commit after a newer one.
+        self._flush_lock = asyncio.Lock()
+
+    async def get(self, game_id) -> Optional[ActiveGame]:
+        game = self.games.get(game_id)
+        if game is None:
+            finished = self.finished.get(game_id)
+            if finished is not None:
+                self.finished.move_to_end(game_id)
+                return finished
+            loaded = await _load_game(game_id)
+            if loaded is None:
+                return None
+            if loaded.status != 'in_progress':
+                self._keep_finished(loaded)
+                return loaded
+            # Another request may have loaded it while we were waiting.
+            game = self.games.setdefault(game_id, loaded)
+        self._touch(game)
+        return game
+
+    def _keep_finished(self, game: ActiveGame):
+        self.finished[game.id] = game
+        self.finished.move_to_end(game.id)
+        while len(self.finished) > self.max_finished:
+            self.finished.popitem(last=False)
+
+    def add(self, game: models.Game) -> ActiveGame:
+        active = ActiveGame.from_model(game)
+        self.games[game.id] = active
+        return active
+
+    def _touch(self, game: ActiveGame):
+        game.last_used = time.monotonic()
+        if game.id in self.games:
+            self.games.move_to_end(game.id)
+
+    def evict(self):
+        # Run between flushes. Games are in least recently used order; dirty or
+        # busy ones stay until flushed.
+        cutoff = time.monotonic() - self.idle_ttl
+        excess = len(self.games) - self.max_games
+        for game_id, game in list(self.games.items()):
+            if excess <= 0 and game.last_used > cutoff:
+                break
+            if game_id not in self.dirty and not game.pending_moves and not game.lock.locked():
+                del self.games[game_id]
+                excess -= 1
+
+    def apply_remote(self, game_id, state: dict, ply: int):
+        # Another server process applied a move; adopt its state if it is newer.
+        # Games not held here need nothing: the move was written through to the
+        # database before it was published, so loading them reads it.
+        game = self.games.get(game_id)
+        if game is None or ply <= game.ply:
+            return
+        game.board = state["board"]
+        game.current_turn = state["current_turn"]
+        game.status = state["status"]
+        game.ply = ply
+        state_cache.invalidate(game_id)
+        if game.status != 'in_progress':
+            # The process that finished the game has already written it.
+            self.discard(game_id)
+
+    def discard(self, game_id):
+        self.games.pop(game_id, None)
+        self.finished.pop(game_id, None)
+        self.dirty.discard(game_id)
+        state_cache.invalidate(game_id)
+
+    async def play(self, game_id, move: schemas.Move, expected_ply: Optional[int] = None,
+                   retry=True) -> Tuple[Optional[ActiveGame], bool]:
+        # Applies a move; returns the game and whether the move was applied.
+        # With expected_ply, the move is rejected unless the game is still at that ply.
+        game = await self.get(game_id)
+        if game is None:
+            return None, False
+        async with game.lock:
+            if self.games.get(game_id) is not game and game.status == 'in_progress':
+                # Evicted while we waited for the lock; play on a fresh copy.
+                return await self.play(game_id, move, expected_ply, retry)
+            if game.status != 'in_progress' or move.player != game.current_turn:
+                return game, False
+            if expected_ply is not None and game.ply != expected_ply:
+                return game, False
+            board = [row[:] for row in game.board]
+            outcome = play_turn(board, move.row, move.side, move.player)
+            if not outcome:
+                return game, False
+            status, current_turn = outcome
+            pending = {"game_id": game_id, "ply": game.ply, "row": move.row, "side": move.side}
+            conflict = self.write_through and not await _save_game(
+                _game_row(game_id, board, current_turn, status, datetime.utcnow()), [pending])
+            if conflict:
+                # Another process moved first; reload the game and judge the move on that.
+                self.discard(game_id)
+            else:
+                game.board = board
+                game.status, game.current_turn = status, current_turn
+                game.ply += 1
+                game.version += 1
+                state_cache.invalidate(game_id)
+                if self.write_through:
+                    game.flushed_version = game.version
+                else:
+                    game.pending_moves.append(pending)
+                    self.dirty.add(game_id)
+                if game.status != 'in_progress':
+                    await self.flush([game_id])
+                    if game.flushed_version == game.version:
+                        self.games.pop(game_id, None)
+                        self._keep_finished(game)
+        if conflict:
+            if retry:
+                return await self.play(game_id, move, expected_ply, retry=False)
+            return await self.get(game_id), False
+        return game, True
+
+    async def flush(self, game_ids=None):
+        async with self._flush_lock:
+            await self._flush(game_ids)
+
+    async def _flush(self, game_ids):
+        ids = list(self.dirty if game_ids is None else self.dirty.intersection(game_ids))
+        # Games discarded since they were marked dirty have nothing left to write.
+        self.dirty.difference_update(game_id for game_id in ids if game_id not in self.games)
+        for start in range(0, len(ids), self.flush_batch):
+            batch = [self.games[game_id] for game_id in ids[start:start + self.flush_batch]
+                     if game_id in self.games]
+            versions = [game.version for game in batch]
+            now = datetime.utcnow()
+            rows = [_game_row(game.id, game.board, game.current_turn, game.status, now) for game in batch]
+            game_moves = [game.pending_moves for game in batch]
+            for game in batch:
+                game.pending_moves = []
+            self.dirty.difference_update(game.id for game in batch)
+            try:
+                await _save_games(rows, [m for moves in game_moves for m in moves])
+            except Exception:
+                logger.exception("Failed to flush %d games, retrying them one by one", len(rows))
+                # One game that can't be written must not hold back the rest.
+                for game, version, row, moves in zip(batch, versions, rows, game_moves):
+                    await self._flush_one(game, version, row, moves)
+                continue
+            for game, version in zip(batch, versions):
+                game.flushed_version = version
+
+    async def _flush_one(self, game: ActiveGame, version, row, moves):
+        try:
+            saved = await _save_game(row, moves)
+        except Exception:
+            logger.exception("Failed to flush game %s, will retry", game.id)
+            game.pending_moves[:0] = moves
+            self.dirty.add(game.id)
+            return
+        if saved:
+            game.flushed_version = version
+        else:
+            logger.error("Game %s was changed by another writer; dropping %d unsaved moves",
+                         game.id, len(moves))
+            if self.games.get(game.id) is game:
+                self.discard(game.id)
+
+    async def _run_flusher(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if self.dirty:
+                await self.flush()
+            self.evict()
+
+    def start(self):
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._run_flusher())
+
+    async def stop(self):
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        await self.flush()
+
+
+game_store = GameStore()
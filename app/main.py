@@ -1,8 +1,15 @@
-import multiprocessing
 import uvicorn
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from app.api import routes
-from app.database import Base, engine
+from app.database import Base, engine, async_engine
+from app.migrations import migrate
+from app.bot_executor import bot_executor
+from app.game_store import game_store
+from app.bot_scheduler import bot_scheduler
+from app.retention import retention_sweeper
+from app.events import event_bus
+from app import metrics
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.routes import websocket_endpoint
 from fastapi.websockets import WebSocket
@@ -14,10 +21,27 @@ dotenv.load_dotenv()
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
+migrate()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    bot_executor.start()
+    await event_bus.start()
+    game_store.start()
+    await bot_scheduler.start()
+    retention_sweeper.start()
+    yield
+    await retention_sweeper.stop()
+    await bot_scheduler.stop()
+    await game_store.stop()
+    await event_bus.stop()
+    bot_executor.shutdown()
+    await async_engine.dispose()
 
 
 # FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
@@ -26,9 +50,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Readable by browser clients: the game list's next-page cursor and state ETags.
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
 app.include_router(routes.router)
+metrics.install(app, [engine, async_engine.sync_engine])
 
 @app.websocket("/ws/games/{game_id}")
 async def websocket_proxy(websocket: WebSocket, game_id: UUID):
@@ -37,5 +64,7 @@ async def websocket_proxy(websocket: WebSocket, game_id: UUID):
 
 # Entry point
 if __name__ == "__main__":
-    cpu_count = multiprocessing.cpu_count()
-    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True, workers=1)
+    # More than one worker needs EVENT_BUS=postgres, which shares game updates
+    # and matchmaking between them and writes every move through to the database.
+    workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=workers == 1, workers=workers)
@@ -0,0 +1,236 @@
+import asyncio
+import json
+import logging
+import os
+import uuid
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from fastapi import WebSocket
+
+from .events import event_bus, EventBus, MATCHMAKING_CHANNEL, WORKER_ID
+
+logger = logging.getLogger(__name__)
+
+MATCHMAKING_BRACKET_SIZE = int(os.getenv("MATCHMAKING_BRACKET_SIZE", "200"))
+MATCHMAKING_CLAIM_TIMEOUT = float(os.getenv("MATCHMAKING_CLAIM_TIMEOUT", "2.0"))
+MATCHMAKING_CLAIM_ATTEMPTS = 3
+
+
+def bucket_for(rating: Optional[int] = None, bracket: Optional[str] = None) -> str:
+    if bracket:
+        return f"bracket:{bracket}"
+    if rating is not None:
+        return f"rating:{int(rating) // MATCHMAKING_BRACKET_SIZE}"
+    return "default"
+
+
+@dataclass
+class WaitingPlayer:
+    id: uuid.UUID
+    bucket: str
+    owner: str  # WORKER_ID of the process holding the socket
+    websocket: Optional[WebSocket] = None
+    claim: Optional[str] = None  # request_id of the claim that granted this player
+
+
+class Matchmaker:
+    """FIFO matchmaking queues, one per rating/skill bucket.
+
+    Each process holds the sockets of the players waiting on it and mirrors
+    the rest of the queue from matchmaking events, so players can be paired
+    across processes. Pairing with a player held elsewhere goes through a
+    claim answered by the owning process, which grants each player at most
+    once; that holds for the player asking for a match as well as for the
+    opponent, so nobody ends up in two games. Only a player's owner takes
+    them out of the queue. Queue operations never await, so no lock is needed.
+    """
+
+    def __init__(self, bus: EventBus, worker_id: str = WORKER_ID):
+        self.bus = bus
+        self.worker_id = worker_id
+        self.buckets: Dict[str, "OrderedDict[uuid.UUID, WaitingPlayer]"] = defaultdict(OrderedDict)
+        self.entries: Dict[uuid.UUID, WaitingPlayer] = {}
+        # Local players granted to a claim from another process, awaiting their game.
+        self.pending: Dict[uuid.UUID, WaitingPlayer] = {}
+        # Players who asked for a match and were withdrawn from the queue, by opponent id.
+        self.withdrawn: Dict[uuid.UUID, Optional[WaitingPlayer]] = {}
+        self._claims: Dict[str, asyncio.Future] = {}
+        bus.subscribe(MATCHMAKING_CHANNEL, self._on_event)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _add(self, entry: WaitingPlayer):
+        self._remove(entry.id)
+        self.entries[entry.id] = entry
+        self.buckets[entry.bucket][entry.id] = entry
+
+    def _remove(self, player_id) -> Optional[WaitingPlayer]:
+        entry = self.entries.pop(player_id, None)
+        if entry is not None:
+            bucket = self.buckets[entry.bucket]
+            bucket.pop(player_id, None)
+            if not bucket:
+                del self.buckets[entry.bucket]
+        return entry
+
+    def _pop_oldest(self, bucket, exclude) -> Optional[WaitingPlayer]:
+        for player_id in self.buckets.get(bucket, ()):
+            if player_id != exclude:
+                return self._remove(player_id)
+        return None
+
+    async def _publish(self, event_type, **fields):
+        await self.bus.publish(MATCHMAKING_CHANNEL, {"type": event_type, "origin": self.worker_id, **fields})
+
+    async def wait(self, player_id: uuid.UUID, websocket: WebSocket, bucket: str):
+        self._add(WaitingPlayer(id=player_id, bucket=bucket, owner=self.worker_id, websocket=websocket))
+        await self._publish("waiting", player_id=str(player_id), bucket=bucket)
+
+    async def leave(self, player_id: uuid.UUID, websocket: WebSocket):
+        pending = self.pending.get(player_id)
+        if pending is not None and pending.websocket is websocket:
+            del self.pending[player_id]
+        entry = self.entries.get(player_id)
+        if entry is not None and entry.websocket is websocket:
+            self._remove(player_id)
+            await self._publish("left", player_id=str(player_id), owner=self.worker_id)
+
+    async def find_opponent(self, player_id: uuid.UUID, bucket: str) -> Optional[WaitingPlayer]:
+        # Take the player out of the queue first, so nobody pairs with them meanwhile.
+        withdrawn, entry = await self._withdraw(player_id)
+        if not withdrawn:
+            # Another match already took them; its owner announces it on their socket.
+            return None
+        for _ in range(MATCHMAKING_CLAIM_ATTEMPTS):
+            opponent = self._pop_oldest(bucket, exclude=player_id)
+            if opponent is None:
+                break
+            if opponent.owner == self.worker_id or await self._claim(opponent):
+                if opponent.owner == self.worker_id:
+                    await self._publish("left", player_id=str(opponent.id), owner=self.worker_id)
+                self.withdrawn[opponent.id] = entry
+                return opponent
+        await self._restore(entry)
+        return None
+
+    async def _withdraw(self, player_id) -> Tuple[bool, Optional[WaitingPlayer]]:
+        # Returns (False, None) if the player was already granted to another match.
+        if player_id in self.pending:
+            return False, None
+        entry = self.entries.get(player_id)
+        if entry is None:
+            return True, None
+        if entry.owner == self.worker_id:
+            self._remove(player_id)
+            await self._publish("left", player_id=str(player_id), owner=self.worker_id)
+            return True, entry
+        if await self._claim(entry):
+            return True, entry
+        return False, None
+
+    async def _restore(self, entry: Optional[WaitingPlayer]):
+        # Puts a withdrawn player back in the queue when no opponent was found.
+        if entry is None:
+            return
+        if entry.owner == self.worker_id:
+            self.requeue(entry)
+            await self._publish("waiting", player_id=str(entry.id), bucket=entry.bucket)
+        else:
+            await self._publish("release", player_id=str(entry.id), owner=entry.owner, request_id=entry.claim)
+
+    async def cancel_match(self, opponent: WaitingPlayer):
+        # Puts both players back when their game could not be created.
+        await self._restore(opponent)
+        await self._restore(self.withdrawn.pop(opponent.id, None))
+
+    def requeue(self, opponent: WaitingPlayer):
+        # Put back a local player whose game could not be created.
+        if opponent.owner == self.worker_id and opponent.websocket is not None:
+            opponent.claim = None
+            self.entries[opponent.id] = opponent
+            bucket = self.buckets[opponent.bucket]
+            bucket[opponent.id] = opponent
+            bucket.move_to_end(opponent.id, last=False)
+
+    async def announce_match(self, opponent: WaitingPlayer, game: dict):
+        self.withdrawn.pop(opponent.id, None)
+        if opponent.websocket is not None:
+            await _notify(opponent.websocket, game)
+        else:
+            await self._publish("matched", player_id=str(opponent.id), owner=opponent.owner, game=game)
+
+    async def _claim(self, opponent: WaitingPlayer) -> bool:
+        request_id = uuid.uuid4().hex
+        future = asyncio.get_running_loop().create_future()
+        self._claims[request_id] = future
+        try:
+            await self._publish("claim", player_id=str(opponent.id), owner=opponent.owner,
+                                request_id=request_id)
+            granted = await asyncio.wait_for(future, MATCHMAKING_CLAIM_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning("Matchmaking claim for %s timed out", opponent.id)
+            # The owner may still grant it; have them put the player back if so.
+            await self._publish("release", player_id=str(opponent.id), owner=opponent.owner,
+                                request_id=request_id)
+            return False
+        finally:
+            self._claims.pop(request_id, None)
+        if granted:
+            opponent.claim = request_id
+        return granted
+
+    def _on_event(self, event):
+        player_id = uuid.UUID(event["player_id"])
+        kind = event["type"]
+        own = event["origin"] == self.worker_id
+        if kind == "waiting":
+            if not own:
+                self._add(WaitingPlayer(id=player_id, bucket=event["bucket"], owner=event["origin"]))
+        elif kind == "left":
+            entry = self.entries.get(player_id)
+            if not own and entry is not None and entry.owner == event.get("owner", event["origin"]):
+                self._remove(player_id)
+        elif kind == "claim":
+            if event["owner"] == self.worker_id:
+                entry = self.entries.get(player_id)
+                granted = entry is not None and entry.owner == self.worker_id
+                if granted:
+                    entry.claim = event["request_id"]
+                    self.pending[player_id] = self._remove(player_id)
+                asyncio.create_task(self._publish(
+                    "claim_result", player_id=event["player_id"], request_id=event["request_id"],
+                    granted=granted))
+        elif kind == "claim_result":
+            if event["granted"] and not own:
+                # The owner took them out when granting, and may have put them back since.
+                self._remove(player_id)
+            future = self._claims.get(event["request_id"])
+            if future is not None and not future.done():
+                future.set_result(event["granted"])
+        elif kind == "release":
+            # A granted claim timed out on the claimer, or its match fell through.
+            entry = self.pending.get(player_id)
+            if (event["owner"] == self.worker_id and entry is not None
+                    and entry.claim == event.get("request_id")):
+                del self.pending[player_id]
+                if entry.websocket is not None:
+                    self.requeue(entry)
+                    asyncio.create_task(self._publish("waiting", player_id=event["player_id"], bucket=entry.bucket))
+        elif kind == "matched":
+            if event["owner"] == self.worker_id:
+                entry = self.pending.pop(player_id, None)
+                if entry is not None and entry.websocket is not None:
+                    asyncio.create_task(_notify(entry.websocket, event["game"]))
+
+
+async def _notify(websocket: WebSocket, game: dict):
+    try:
+        await websocket.send_text(json.dumps(game))
+    except Exception:
+        pass  # If they're disconnected, we just fail silently
+
+
+matchmaker = Matchmaker(event_bus)
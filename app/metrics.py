@@ -0,0 +1,247 @@
+import logging
+import math
+import os
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import FastAPI, Request
+from fastapi.responses import HTMLResponse, PlainTextResponse
+from sqlalchemy import event
+
+try:
+    from pyinstrument import Profiler
+except ImportError:  # optional, only needed for ?profile=1
+    Profiler = None
+
+logger = logging.getLogger(__name__)
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "false").lower() in ("1", "true", "yes")
+# Lets a request ask for a pyinstrument profile with ?profile=1 instead of its response.
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes")
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+NODE_BUCKETS = (10, 100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+DEPTH_BUCKETS = (0, 1, 2, 4, 6, 8, 10, 12, 16, 20, 30, 49)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name, help, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.values: Dict[Tuple, object] = {}
+
+    def _key(self, labels):
+        return tuple(labels[name] for name in self.labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name, help, labels=()):
+        super().__init__(name, help, labels)
+        self.function: Optional[Callable[[], float]] = None
+
+    def set(self, value, **labels):
+        self.values[self._key(labels)] = value
+
+    def set_function(self, function: Callable[[], float]):
+        # Read the value from ``function`` at scrape time (unlabelled gauges only).
+        self.function = function
+
+    def render(self):
+        if self.function is not None:
+            self.values[()] = self.function()
+        return super().render()
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        state = self.values.get(key)
+        if state is None:
+            state = self.values[key] = [[0] * len(self.buckets), 0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                state[0][i] += 1
+                break
+        state[1] += value
+        state[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total, count) in sorted(self.values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labels, key, [("le", _format_value(bound))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labels, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    """A minimal in-process metrics registry rendered in Prometheus text format.
+
+    Each server process keeps its own values; scrape every worker, or run one.
+    """
+
+    def __init__(self):
+        self.metrics: List[_Metric] = []
+
+    def _register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labels=()) -> Counter:
+        return self._register(Counter(name, help, labels))
+
+    def gauge(self, name, help, labels=()) -> Gauge:
+        return self._register(Gauge(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+HTTP_LATENCY = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route.", ("method", "route", "status"))
+HTTP_DB_QUERIES = registry.histogram(
+    "http_request_db_queries", "Database queries made per HTTP request.", ("route",), COUNT_BUCKETS)
+HTTP_DB_SECONDS = registry.histogram(
+    "http_request_db_seconds", "Time spent in database queries per HTTP request.", ("route",))
+DB_QUERIES = registry.counter("db_queries_total", "Database queries executed.")
+DB_QUERY_SECONDS = registry.histogram("db_query_duration_seconds", "Database query latency.")
+
+SEARCHES = registry.counter("bot_searches_total", "Bot searches completed.", ("difficulty",))
+SEARCH_NODES = registry.histogram(
+    "bot_search_nodes", "Nodes visited per bot search.", ("difficulty",), NODE_BUCKETS)
+SEARCH_CUTOFFS = registry.counter("bot_search_cutoffs_total", "Beta cutoffs in bot searches.", ("difficulty",))
+SEARCH_DEPTH = registry.histogram(
+    "bot_search_depth", "Depth reached per bot search.", ("difficulty",), DEPTH_BUCKETS)
+SEARCH_SECONDS = registry.histogram(
+    "bot_search_seconds", "Bot think time, including queueing in the pool.", ("difficulty",))
+
+WS_CONNECTIONS = registry.gauge("websocket_connections", "Open game WebSocket connections.")
+WS_FANOUT_SECONDS = registry.histogram(
+    "websocket_fanout_seconds", "Time to encode and queue one update for all subscribers of a game.")
+WS_SEND_FAILURES = registry.counter(
+    "websocket_send_failures_total", "WebSocket connections dropped while sending.", ("reason",))
+
+# [queries, seconds] for the HTTP request being handled, if any.
+_request_db: ContextVar[Optional[list]] = ContextVar("request_db", default=None)
+
+
+def observe_search(difficulty, result, seconds):
+    SEARCHES.inc(difficulty=difficulty)
+    SEARCH_NODES.observe(result.nodes, difficulty=difficulty)
+    SEARCH_CUTOFFS.inc(result.cutoffs, difficulty=difficulty)
+    SEARCH_DEPTH.observe(result.depth, difficulty=difficulty)
+    SEARCH_SECONDS.observe(seconds, difficulty=difficulty)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    DB_QUERIES.inc()
+    DB_QUERY_SECONDS.observe(elapsed)
+    current = _request_db.get()
+    if current is not None:
+        current[0] += 1
+        current[1] += elapsed
+
+
+def _route_name(request: Request):
+    route = request.scope.get("route")
+    return route.path if route is not None else "unmatched"
+
+
+async def _metrics_middleware(request: Request, call_next):
+    if PROFILING_ENABLED and Profiler is not None and request.query_params.get("profile"):
+        profiler = Profiler(async_mode="enabled")
+        profiler.start()
+        await call_next(request)
+        profiler.stop()
+        return HTMLResponse(profiler.output_html())
+
+    db = [0, 0.0]
+    token = _request_db.set(db)
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        _request_db.reset(token)
+        route = _route_name(request)
+        HTTP_LATENCY.observe(time.perf_counter() - start, method=request.method, route=route, status=status)
+        HTTP_DB_QUERIES.observe(db[0], route=route)
+        HTTP_DB_SECONDS.observe(db[1], route=route)
+
+
+async def metrics_endpoint():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
+def install(app: FastAPI, engines):
+    """Adds /metrics, request timing and query counting, when enabled by env."""
+    if PROFILING_ENABLED and Profiler is None:
+        logger.warning("PROFILING_ENABLED is set but pyinstrument is not installed")
+    if METRICS_ENABLED:
+        for engine in engines:
+            event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        app.add_api_route("/metrics", metrics_endpoint, include_in_schema=False)
+    if METRICS_ENABLED or PROFILING_ENABLED:
+        app.middleware("http")(_metrics_middleware)
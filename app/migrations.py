@@ -0,0 +1,79 @@
+"""Schema upgrades for databases created before a column or table existed.
+
+``Base.metadata.create_all`` only creates missing tables, so columns added to
+existing tables are upgraded here. Every step is idempotent; ``migrate`` runs
+at startup and can also be run by hand:
+
+    python -m app.migrations [--batch-size 1000]
+"""
+import argparse
+import logging
+
+from sqlalchemy import inspect, select, text, update
+
+from . import models
+from .bitboard import BitBoard
+from .database import SessionLocal, engine
+
+logger = logging.getLogger(__name__)
+
+
+def _add_missing_columns(conn, table, columns):
+    existing = {column["name"] for column in inspect(conn).get_columns(table)}
+    for name, ddl in columns:
+        if name not in existing:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}"))
+
+
+def _create_missing_indexes(conn, table):
+    for index in table.indexes:
+        index.create(conn, checkfirst=True)
+
+
+def upgrade_schema():
+    with engine.begin() as conn:
+        _add_missing_columns(conn, "games", [
+            ("board_x", "BIGINT"), ("board_o", "BIGINT"), ("updated_at", "TIMESTAMP")])
+        # Rows from before updated_at count as last touched when they were created.
+        conn.execute(text("UPDATE games SET updated_at = created_at WHERE updated_at IS NULL"))
+        if conn.dialect.name == "postgresql":
+            # New rows only write the packed columns.
+            conn.execute(text("ALTER TABLE games ALTER COLUMN board DROP NOT NULL"))
+        _create_missing_indexes(conn, models.Game.__table__)
+
+
+def backfill_compact_boards(batch_size=1000):
+    """Pack JSON boards into board_x/board_o and clear the JSON, in batches."""
+    migrated = 0
+    while True:
+        with SessionLocal() as db:
+            rows = db.execute(
+                select(models.Game.id, models.Game.board_json)
+                .where(models.Game.board_x.is_(None))
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            updates = []
+            for game_id, board in rows:
+                bb = BitBoard.from_board(board)
+                updates.append({"id": game_id, "board_x": bb.x, "board_o": bb.o, "board_json": None})
+            db.execute(update(models.Game), updates)
+            db.commit()
+            migrated += len(updates)
+    if migrated:
+        logger.info("Packed %d JSON boards into bitboard columns", migrated)
+    return migrated
+
+
+def migrate(batch_size=1000):
+    upgrade_schema()
+    backfill_compact_boards(batch_size)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Upgrade the side-stacker database schema.")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    migrate(args.batch_size)
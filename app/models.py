@@ -1,9 +1,10 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, DateTime, JSON, Enum, ForeignKey
+from sqlalchemy import Column, String, DateTime, JSON, Enum, ForeignKey, BigInteger, SmallInteger, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from .database import Base
+from .bitboard import BitBoard
 import enum
 
 class PlayerType(str, enum.Enum):
@@ -21,12 +22,54 @@ class Player(Base):
 class Game(Base):
     __tablename__ = "games"
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    player_1_id = Column(UUID(as_uuid=True), ForeignKey("players.id"), nullable=False)
-    player_2_id = Column(UUID(as_uuid=True), ForeignKey("players.id"), nullable=False)
+    player_1_id = Column(UUID(as_uuid=True), ForeignKey("players.id"), nullable=False, index=True)
+    player_2_id = Column(UUID(as_uuid=True), ForeignKey("players.id"), nullable=False, index=True)
     current_turn = Column(String, default='x')
-    board = Column(JSON, nullable=False)
-    status = Column(String, default='in_progress')
-    created_at = Column(DateTime, default=datetime.utcnow)
+    # Packed bitboards, one bit per cell (see app.bitboard). The JSON column is
+    # only read for rows written before the compact format; see app.migrations.
+    board_x = Column(BigInteger)
+    board_o = Column(BigInteger)
+    board_json = Column("board", JSON(none_as_null=True), nullable=True)
+    status = Column(String, default='in_progress', index=True)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    # Time of the last move written, used to expire games nobody is playing.
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
 
     player_1 = relationship("Player", foreign_keys=[player_1_id])
     player_2 = relationship("Player", foreign_keys=[player_2_id])
+
+    # Keyset pagination order for game listings.
+    __table_args__ = (Index("ix_games_created_at_id", "created_at", "id"),)
+
+    @property
+    def board(self):
+        if self.board_x is None:
+            return self.board_json
+        return BitBoard.from_bits(self.board_x, self.board_o).to_board()
+
+    @board.setter
+    def board(self, board):
+        bb = BitBoard.from_board(board)
+        self.board_x = bb.x
+        self.board_o = bb.o
+        self.board_json = None
+
+class GameMove(Base):
+    __tablename__ = "moves"
+    game_id = Column(UUID(as_uuid=True), ForeignKey("games.id", ondelete="CASCADE"), primary_key=True)
+    ply = Column(SmallInteger, primary_key=True)  # 0-based; even plies are x, odd are o
+    row = Column(SmallInteger, nullable=False)
+    side = Column(String(1), nullable=False)
+
+class ArchivedGame(Base):
+    # Finished games moved out of "games" by app.retention; moves are not kept.
+    __tablename__ = "archived_games"
+    id = Column(UUID(as_uuid=True), primary_key=True)
+    player_1_id = Column(UUID(as_uuid=True), nullable=False, index=True)
+    player_2_id = Column(UUID(as_uuid=True), nullable=False, index=True)
+    board_x = Column(BigInteger, nullable=False)
+    board_o = Column(BigInteger, nullable=False)
+    status = Column(String, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+    finished_at = Column(DateTime)
+    archived_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -0,0 +1,159 @@
+"""Opening book: deep-searched early positions in a memory-mapped file.
+
+The book holds every position reachable within a few plies of the empty
+board, each searched far deeper than the bots do at play time. Positions
+that are mirror images share one entry. Build it offline with
+
+    python -m app.opening_book --plies 2 --depth 8 --out book.bin [--workers N]
+
+and point OPENING_BOOK_PATH at the file. The file is a header followed by
+fixed-size records sorted by key, so lookups are a binary search over an
+mmap: nothing is loaded up front, and every worker process shares the same
+pages.
+"""
+import argparse
+import logging
+import mmap
+import multiprocessing
+import os
+import struct
+import time
+from typing import Optional
+
+from .bitboard import BitBoard, decode_move, other
+from .search import SearchResult, TranspositionTable, search
+
+logger = logging.getLogger(__name__)
+
+OPENING_BOOK_PATH = os.getenv("OPENING_BOOK_PATH")
+
+MAGIC = b"SSBOOK1\0"
+# magic, record count
+_HEADER = struct.Struct("<8sI")
+# canonical key, move (in the canonical orientation), depth searched, score
+_RECORD = struct.Struct("<QBBi")
+_KEY = struct.Struct("<Q")
+
+
+class OpeningBook:
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or len(self._map) != _HEADER.size + self.count * _RECORD.size:
+            self._map.close()
+            raise ValueError(f"{path} is not an opening book")
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        self._map.close()
+
+    def probe(self, key):
+        """Returns (move, depth, score) stored for a canonical key, or None."""
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset = _HEADER.size + mid * _RECORD.size
+            mid_key = _KEY.unpack_from(self._map, offset)[0]
+            if mid_key < key:
+                lo = mid + 1
+            elif mid_key > key:
+                hi = mid
+            else:
+                return _RECORD.unpack_from(self._map, offset)[1:]
+        return None
+
+    def lookup(self, bb: BitBoard, symbol) -> Optional[SearchResult]:
+        key, mirrored = bb.canonical_hash(symbol)
+        entry = self.probe(key)
+        if entry is None:
+            return None
+        move, depth, score = entry
+        move ^= mirrored
+        if not bb.can_play(move):
+            return None
+        return SearchResult(move=decode_move(move), score=score, depth=depth, nodes=0,
+                            elapsed=0.0, pv=[decode_move(move)])
+
+
+_book = None
+_book_failed = False
+
+
+def get_book() -> Optional[OpeningBook]:
+    # Opened on first use in each process, so pool workers map it themselves.
+    global _book, _book_failed
+    if _book is None and OPENING_BOOK_PATH and not _book_failed:
+        try:
+            _book = OpeningBook(OPENING_BOOK_PATH)
+        except (OSError, ValueError):
+            logger.exception("Could not open opening book %s", OPENING_BOOK_PATH)
+            _book_failed = True
+    return _book
+
+
+def book_positions(plies):
+    """Yields (x, o, symbol) for each non-terminal position up to ``plies``, one per mirror pair."""
+    seen = set()
+    frontier = [BitBoard()]
+    symbol = 'x'
+    for ply in range(plies + 1):
+        next_frontier = []
+        for bb in frontier:
+            key, _ = bb.canonical_hash(symbol)
+            if key in seen:
+                continue
+            seen.add(key)
+            yield bb.x, bb.o, symbol
+            if ply == plies:
+                continue
+            for move in bb.legal_moves():
+                bb.play(move, symbol)
+                if not (bb.has_won(symbol) or bb.is_full()):
+                    next_frontier.append(BitBoard.from_bits(bb.x, bb.o))
+                bb.undo()
+        frontier = next_frontier
+        symbol = other(symbol)
+
+
+_worker_tt = None
+
+
+def _search_position(task):
+    global _worker_tt
+    x, o, symbol, depth, time_budget = task
+    if _worker_tt is None:
+        _worker_tt = TranspositionTable(20)
+    bb = BitBoard.from_bits(x, o)
+    result = search(bb, symbol, depth, time_budget, _worker_tt)
+    key, mirrored = bb.canonical_hash(symbol)
+    move = result.move[0] * 2 + (result.move[1] == 'R')
+    return key, move ^ mirrored, result.depth, result.score
+
+
+def build(path, plies, depth, time_budget=None, workers=None):
+    tasks = [(x, o, symbol, depth, time_budget) for x, o, symbol in book_positions(plies)]
+    start = time.perf_counter()
+    with multiprocessing.Pool(workers) as pool:
+        records = sorted(pool.imap_unordered(_search_position, tasks, chunksize=4))
+    with open(path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, len(records)))
+        for record in records:
+            f.write(_RECORD.pack(*record))
+    logger.info("Wrote %d positions to %s in %.1fs", len(records), path, time.perf_counter() - start)
+    return len(records)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the side-stacker opening book.")
+    parser.add_argument("--plies", type=int, default=2, help="book every position up to this many plies")
+    parser.add_argument("--depth", type=int, default=8, help="search depth per position")
+    parser.add_argument("--time-budget", type=float, help="seconds per position, on top of the depth limit")
+    parser.add_argument("--workers", type=int, help="parallel processes (default: all cores)")
+    parser.add_argument("--out", default="opening_book.bin")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    build(args.out, args.plies, args.depth, args.time_budget, args.workers)
@@ -0,0 +1,116 @@
+import asyncio
+import logging
+import os
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+from uuid import UUID
+
+from .bitboard import BitBoard, other
+from .bot_executor import bot_executor, BotExecutor
+from .game_store import ActiveGame
+from .search import SearchResult
+
+logger = logging.getLogger(__name__)
+
+PONDER_ENABLED = os.getenv("PONDER_ENABLED", "true").lower() in ("1", "true", "yes")
+PONDER_MAX_GAMES = int(os.getenv("PONDER_MAX_GAMES", "256"))
+# Ponder searches in flight at once across all games, on top of interactive ones.
+PONDER_CONCURRENCY = int(os.getenv("PONDER_CONCURRENCY", str(max(1, bot_executor.pool_size // 2))))
+PONDER_IDLE_WAIT = 0.1
+
+PONDERED = ('medium_bot', 'hard_bot')
+
+
+@dataclass
+class _Ponder:
+    difficulty: str
+    bot_symbol: str
+    task: Optional[asyncio.Task] = None
+    # Bot reply to each human reply, keyed by the (x, o) bitboards after it.
+    results: Dict[Tuple[int, int], SearchResult] = field(default_factory=dict)
+    # The reply being searched right now and its search.
+    current: Optional[Tuple[Tuple[int, int], asyncio.Future]] = None
+
+
+class Ponderer:
+    """Searches the bot's answer to each human reply while the human thinks.
+
+    After a bot move in a human-vs-bot game, every legal human reply is
+    searched in the background, the one the bot's principal variation
+    expects first. When the human moves, ``take`` returns the stored answer,
+    or waits for it if that reply is being searched right now, and stops
+    pondering the game. At most ``max_games`` games are pondered, least
+    recently started ones are dropped first, and ponder searches only start
+    on bot pool workers that no search, ponder or interactive, is using.
+    """
+
+    def __init__(self, executor: BotExecutor, max_games=PONDER_MAX_GAMES, concurrency=PONDER_CONCURRENCY):
+        self.executor = executor
+        self.max_games = max_games
+        self.slots = asyncio.Semaphore(concurrency)
+        self.games: "OrderedDict[UUID, _Ponder]" = OrderedDict()
+
+    def start(self, game: ActiveGame, difficulty: str, expected_reply: Optional[Tuple[int, str]] = None):
+        self.discard(game.id)
+        if not PONDER_ENABLED or difficulty not in PONDERED or game.status != 'in_progress':
+            return
+        entry = _Ponder(difficulty=difficulty, bot_symbol=other(game.current_turn))
+        entry.task = asyncio.create_task(self._run(entry, game.board, game.current_turn, expected_reply))
+        self.games[game.id] = entry
+        while len(self.games) > self.max_games:
+            _, evicted = self.games.popitem(last=False)
+            evicted.task.cancel()
+
+    def discard(self, game_id: UUID):
+        entry = self.games.pop(game_id, None)
+        if entry is not None:
+            entry.task.cancel()
+
+    async def take(self, game_id: UUID, board, bot_symbol: str, difficulty: str) -> Optional[SearchResult]:
+        entry = self.games.pop(game_id, None)
+        if entry is None:
+            return None
+        entry.task.cancel()
+        if entry.difficulty != difficulty or entry.bot_symbol != bot_symbol:
+            return None
+        bb = BitBoard.from_board(board)
+        key = (bb.x, bb.o)
+        result = entry.results.get(key)
+        if result is None and entry.current is not None and entry.current[0] == key:
+            result = await entry.current[1]
+        return result
+
+    async def _run(self, entry: _Ponder, board, human_symbol, expected_reply):
+        bb = BitBoard.from_board(board)
+        replies = [move for move in bb.legal_moves()
+                   if not (move & 1 and bb.left[move >> 1] == bb.right[move >> 1])]
+        if expected_reply is not None:
+            expected = expected_reply[0] * 2 + (expected_reply[1] == 'R')
+            if expected in replies:
+                replies.remove(expected)
+                replies.insert(0, expected)
+        try:
+            for move in replies:
+                bb.play(move, human_symbol)
+                key = (bb.x, bb.o)
+                finished = bb.has_won(human_symbol) or bb.is_full()
+                bb.undo()
+                if finished:
+                    continue
+                async with self.slots:
+                    while self.executor.pending + self.executor.pondering >= self.executor.pool_size:
+                        await asyncio.sleep(PONDER_IDLE_WAIT)
+                    # Shielded so that take() can still collect it after the loop is cancelled.
+                    search = asyncio.ensure_future(
+                        self.executor.ponder(key[0], key[1], entry.bot_symbol, entry.difficulty))
+                    entry.current = (key, search)
+                    entry.results[key] = await asyncio.shield(search)
+                    entry.current = None
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Pondering failed")
+
+
+ponderer = Ponderer(bot_executor)
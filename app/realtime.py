@@ -0,0 +1,50 @@
+from typing import Optional
+from uuid import UUID
+
+from . import schemas, wire
+from .broadcast import broadcaster
+from .events import event_bus, GAME_CHANNEL, WORKER_ID
+from .game_store import game_store, ActiveGame
+
+# Game updates travel over the event bus so that spectators connected to any
+# server process receive them, and so other processes keep their in-memory
+# copy of the game current.
+
+
+async def publish_game(game: ActiveGame, state: schemas.GameState, move: Optional[schemas.Move] = None):
+    # move is the one that produced this state; clients using the delta
+    # protocol get a snapshot instead when it is not given.
+    await event_bus.publish(GAME_CHANNEL, {
+        "type": "update",
+        "origin": WORKER_ID,
+        "game_id": str(game.id),
+        "ply": game.ply,
+        "move": move.model_dump() if move else None,
+        "state": state.model_dump(mode="json"),
+    })
+
+
+async def publish_game_deleted(game_id: UUID):
+    await event_bus.publish(GAME_CHANNEL, {
+        "type": "deleted",
+        "origin": WORKER_ID,
+        "game_id": str(game_id),
+    })
+
+
+def _on_game_event(event):
+    game_id = UUID(event["game_id"])
+    remote = event["origin"] != WORKER_ID
+    if event["type"] == "update":
+        if remote:
+            game_store.apply_remote(game_id, event["state"], event["ply"])
+        if broadcaster.connection_count(game_id):
+            broadcaster.publish(game_id, lambda fmt: wire.update(fmt, event))
+    elif event["type"] == "deleted":
+        if remote:
+            game_store.discard(game_id)
+        if broadcaster.connection_count(game_id):
+            broadcaster.publish(game_id, lambda fmt: wire.deleted(fmt, event["game_id"]))
+
+
+event_bus.subscribe(GAME_CHANNEL, _on_game_event)
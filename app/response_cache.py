@@ -0,0 +1,44 @@
+import os
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional, Tuple
+from uuid import UUID
+
+STATE_CACHE_SIZE = int(os.getenv("STATE_CACHE_SIZE", "10000"))
+
+
+class ResponseCache:
+    """LRU cache of serialized game state responses keyed by (game_id, version).
+
+    The version is anything that changes whenever the state does, such as
+    the game's ETag.
+
+    Only the latest version of a game is worth keeping, so each game holds at
+    most one entry; a lookup for any other version is a miss.
+    """
+
+    def __init__(self, max_size=STATE_CACHE_SIZE):
+        self.max_size = max_size
+        self.entries: "OrderedDict[UUID, Tuple[Hashable, bytes]]" = OrderedDict()
+
+    def get(self, game_id: UUID, version: Hashable) -> Optional[bytes]:
+        entry = self.entries.get(game_id)
+        if entry is None or entry[0] != version:
+            return None
+        self.entries.move_to_end(game_id)
+        return entry[1]
+
+    def get_or_render(self, game_id: UUID, version: Hashable, render: Callable[[], bytes]) -> bytes:
+        body = self.get(game_id, version)
+        if body is None:
+            body = render()
+            self.entries[game_id] = (version, body)
+            self.entries.move_to_end(game_id)
+            if len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+        return body
+
+    def invalidate(self, game_id: UUID):
+        self.entries.pop(game_id, None)
+
+
+state_cache = ResponseCache()
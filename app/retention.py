@@ -0,0 +1,99 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+from . import async_crud
+from .database import AsyncSessionLocal, advisory_lock
+from .game_store import game_store
+from .ponder import ponderer
+
+logger = logging.getLogger(__name__)
+
+# Every worker runs the sweeper, but an advisory lock lets only one sweep at a time.
+RETENTION_ENABLED = os.getenv("RETENTION_ENABLED", "true").lower() in ("1", "true", "yes")
+RETENTION_INTERVAL = float(os.getenv("RETENTION_INTERVAL", "3600"))
+RETENTION_BATCH = int(os.getenv("RETENTION_BATCH", "1000"))
+# Finished games older than this are moved to archived_games.
+ARCHIVE_AFTER_DAYS = float(os.getenv("ARCHIVE_AFTER_DAYS", "30"))
+# In-progress games without a move for this long are marked abandoned.
+ABANDON_AFTER_DAYS = float(os.getenv("ABANDON_AFTER_DAYS", "7"))
+RETENTION_LOCK_KEY = 0x5151_0025
+
+
+class RetentionSweeper:
+    """Keeps the games table down to recent and live games.
+
+    Every ``interval`` seconds, in-progress games idle for longer than
+    ``abandon_after`` are marked abandoned, and finished games (abandoned
+    ones included) older than ``archive_after`` are copied to the compact
+    archived_games table and deleted with their moves. Both steps work in
+    batches of ``batch_size`` games, one transaction per batch.
+    """
+
+    def __init__(self, interval=RETENTION_INTERVAL, batch_size=RETENTION_BATCH,
+                 archive_after=timedelta(days=ARCHIVE_AFTER_DAYS),
+                 abandon_after=timedelta(days=ABANDON_AFTER_DAYS)):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.archive_after = archive_after
+        self.abandon_after = abandon_after
+        self._task: Optional[asyncio.Task] = None
+
+    async def expire_abandoned(self, now: datetime) -> int:
+        expired = 0
+        while True:
+            async with AsyncSessionLocal() as db:
+                game_ids = await async_crud.expire_abandoned_games(
+                    db, now - self.abandon_after, self.batch_size)
+            for game_id in game_ids:
+                game_store.discard(game_id)
+                ponderer.discard(game_id)
+            expired += len(game_ids)
+            if len(game_ids) < self.batch_size:
+                return expired
+
+    async def archive_finished(self, now: datetime) -> int:
+        archived = 0
+        while True:
+            async with AsyncSessionLocal() as db:
+                game_ids = await async_crud.archive_finished_games(db, now - self.archive_after, self.batch_size)
+            for game_id in game_ids:
+                game_store.discard(game_id)
+            archived += len(game_ids)
+            if len(game_ids) < self.batch_size:
+                return archived
+
+    async def sweep(self):
+        async with advisory_lock(RETENTION_LOCK_KEY) as locked:
+            if not locked:
+                # Another worker is sweeping.
+                return 0, 0
+            now = datetime.utcnow()
+            expired = await self.expire_abandoned(now)
+            archived = await self.archive_finished(now)
+        if expired or archived:
+            logger.info("Marked %d games abandoned and archived %d finished games", expired, archived)
+        return expired, archived
+
+    async def _run(self):
+        while True:
+            try:
+                await self.sweep()
+            except Exception:
+                logger.exception("Retention sweep failed, will retry")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if RETENTION_ENABLED and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+retention_sweeper = RetentionSweeper()
@@ -1,9 +1,10 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from typing import List, Optional
 from uuid import UUID
 from enum import Enum
 from typing import Any
 from pydantic.fields import Field
+from datetime import datetime
 
 class PlayerType(str, Enum):
     human = "human"
@@ -16,6 +17,8 @@ class PlayerCreate(BaseModel):
     type: PlayerType
 
 class PlayerInfo(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     id: UUID
     nickname: str
     type: PlayerType
@@ -35,4 +38,34 @@ class GameState(BaseModel):
     current_turn: str
     status: str
     player_1: PlayerInfo
-    player_2: PlayerInfo
\ No newline at end of file
+    player_2: PlayerInfo
+
+class GameSummary(BaseModel):
+    id: str
+    current_turn: str
+    status: str
+    created_at: datetime
+    player_1: PlayerInfo
+    player_2: PlayerInfo
+
+class AnalysisPosition(BaseModel):
+    board: List[List[str]]
+    side: str  # 'x' or 'o' to move
+    difficulty: Optional[PlayerType] = None
+    depth: Optional[int] = Field(default=None, ge=1, le=49)
+    time_budget: Optional[float] = Field(default=None, gt=0, le=60)
+
+class AnalysisRequest(BaseModel):
+    positions: List[AnalysisPosition] = Field(max_length=10000)
+
+class AnalysisMove(BaseModel):
+    row: int
+    side: str
+
+class AnalysisResult(BaseModel):
+    index: int
+    move: Optional[AnalysisMove]
+    score: int
+    depth: int
+    nodes: int
+    pv: List[AnalysisMove]
@@ -0,0 +1,281 @@
+import os
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+from .bitboard import BitBoard, CELLS, FULL, MOVES, decode_move, other, threat_cells
+
+WIN_SCORE = 100000
+# Scores beyond this are forced wins/losses; they carry the ply distance.
+WIN_THRESHOLD = WIN_SCORE - CELLS - 1
+
+EXACT, LOWER, UPPER = 0, 1, 2
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+@dataclass
+class SearchResult:
+    move: Optional[Tuple[int, str]]
+    score: int
+    depth: int
+    nodes: int
+    elapsed: float
+    # Expected line of play starting with ``move``, as (row, side) pairs.
+    pv: List[Tuple[int, str]] = field(default_factory=list)
+    # Beta cutoffs during the search.
+    cutoffs: int = 0
+
+
+class TranspositionTable:
+    """Fixed-size table indexed by the low bits of the Zobrist key.
+
+    Entries are (key, depth, flag, score, move, age) tuples. A slot is
+    overwritten when it holds the same position, an entry from an older
+    search, or a shallower search; otherwise the deeper entry is kept.
+    """
+
+    def __init__(self, size_bits=18):
+        self.mask = (1 << size_bits) - 1
+        self.entries = [None] * (1 << size_bits)
+        self.age = 0
+
+    def new_search(self):
+        self.age += 1
+
+    def clear(self):
+        self.entries = [None] * len(self.entries)
+
+    def probe(self, key):
+        entry = self.entries[key & self.mask]
+        if entry is not None and entry[0] == key:
+            return entry
+        return None
+
+    def store(self, key, depth, flag, score, move):
+        index = key & self.mask
+        entry = self.entries[index]
+        if entry is None or entry[0] == key or entry[5] != self.age or depth >= entry[1]:
+            self.entries[index] = (key, depth, flag, score, move, self.age)
+
+
+_tt = TranspositionTable(int(os.getenv("SEARCH_TT_BITS", "18")))
+
+
+def _to_tt(score, ply):
+    # Win/loss scores are stored relative to the node, not the root.
+    if score > WIN_THRESHOLD:
+        return score + ply
+    if score < -WIN_THRESHOLD:
+        return score - ply
+    return score
+
+
+def _from_tt(score, ply):
+    if score > WIN_THRESHOLD:
+        return score - ply
+    if score < -WIN_THRESHOLD:
+        return score + ply
+    return score
+
+
+class _Searcher:
+    """One search's state: node counts and the move-ordering tables.
+
+    Moves are tried in the order: transposition table move, moves that block
+    an immediate opponent win, the two killer moves of the ply (recent
+    quiet moves that caused a cutoff there), then by history score (depth²
+    summed over the cutoffs a move caused, per side). An immediate win ends
+    the node at once. Positions and their left-right mirror images share one
+    transposition table entry, and 'R' moves equivalent to the row's 'L'
+    move are skipped.
+    """
+
+    def __init__(self, bb, tt, deadline):
+        self.bb = bb
+        self.tt = tt
+        self.deadline = deadline
+        self.nodes = 0
+        self.cutoffs = 0
+        self.killers = [[None, None] for _ in range(CELLS + 1)]
+        self.history = {'x': [0] * len(MOVES), 'o': [0] * len(MOVES)}
+
+    def threats(self, symbol):
+        # Cells where ``symbol`` would win with its next move.
+        bb = self.bb
+        return threat_cells(bb.bits(symbol), FULL ^ (bb.x | bb.o)) & bb.playable_cells()
+
+    def winning_move(self, symbol):
+        bb = self.bb
+        threats = self.threats(symbol)
+        if threats:
+            for move in bb.legal_moves():
+                if threats >> bb.target_cell(move) & 1:
+                    return move
+        return None
+
+    def ordered(self, symbol, ply, first):
+        bb = self.bb
+        blocks = self.threats(other(symbol))
+        killers = self.killers[ply]
+        history = self.history[symbol]
+        symmetric = bb.is_symmetric()
+        left, right = bb.left, bb.right
+        scored = []
+        for move in bb.legal_moves():
+            # 'R' repeats 'L' when the row has one free cell or the position is symmetric.
+            if move & 1 and (symmetric or left[move >> 1] == right[move >> 1]):
+                continue
+            if move == first:
+                priority = 1 << 40
+            elif blocks >> bb.target_cell(move) & 1:
+                priority = 1 << 39
+            elif move == killers[0]:
+                priority = 1 << 38
+            elif move == killers[1]:
+                priority = 1 << 37
+            else:
+                priority = history[move]
+            scored.append((priority, move))
+        scored.sort(reverse=True)
+        return [move for _, move in scored]
+
+    def record_cutoff(self, move, symbol, depth, ply):
+        self.cutoffs += 1
+        killers = self.killers[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+        self.history[symbol][move] += depth * depth
+
+    def negamax(self, depth, alpha, beta, symbol, ply):
+        self.nodes += 1
+        if self.deadline is not None and not self.nodes & 1023 and time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+
+        bb = self.bb
+        if depth == 0 or bb.is_full():
+            return bb.evaluate(symbol)
+        # Nothing beats winning on this move.
+        if self.threats(symbol):
+            return WIN_SCORE - ply - 1
+
+        key, mirrored = bb.canonical_hash(symbol)
+        alpha_orig = alpha
+        tt_move = None
+        entry = self.tt.probe(key)
+        if entry is not None:
+            if entry[4] is not None:
+                tt_move = entry[4] ^ mirrored
+            if entry[1] >= depth:
+                score = _from_tt(entry[3], ply)
+                flag = entry[2]
+                if flag == EXACT:
+                    return score
+                if flag == LOWER:
+                    alpha = max(alpha, score)
+                else:
+                    beta = min(beta, score)
+                if alpha >= beta:
+                    return score
+
+        opponent = other(symbol)
+        best_score = -WIN_SCORE - 1
+        best_move = None
+        for move in self.ordered(symbol, ply, tt_move):
+            bb.play(move, symbol)
+            score = -self.negamax(depth - 1, -beta, -alpha, opponent, ply + 1)
+            bb.undo()
+            if score > best_score:
+                best_score = score
+                best_move = move
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        self.record_cutoff(move, symbol, depth, ply)
+                        break
+
+        if best_score <= alpha_orig:
+            flag = UPPER
+        elif best_score >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.tt.store(key, depth, flag, _to_tt(best_score, ply),
+                      best_move ^ mirrored if best_move is not None else None)
+        return best_score
+
+
+def search(bb: BitBoard, symbol, max_depth, time_budget=None, tt=None) -> SearchResult:
+    """Iterative-deepening alpha-beta from ``symbol``'s point of view.
+
+    Deepens one ply at a time until ``max_depth`` or ``time_budget`` seconds
+    run out, returning the best move of the last completed iteration. Depth 1
+    always completes so a legal move is returned whenever one exists.
+    """
+    tt = _tt if tt is None else tt
+    tt.new_search()
+    start = time.perf_counter()
+    deadline = start + time_budget if time_budget is not None else None
+    searcher = _Searcher(bb, tt, None)
+    opponent = other(symbol)
+    max_depth = min(max_depth, CELLS - bb.count)
+
+    base = len(bb.history)
+    best_move, best_score, completed = None, 0, 0
+    winning_move = searcher.winning_move(symbol)
+    if winning_move is not None:
+        best_move, best_score, completed = winning_move, WIN_SCORE - 1, 1
+        max_depth = 0
+    for depth in range(1, max_depth + 1):
+        searcher.deadline = deadline if depth > 1 else None
+        alpha, beta = -WIN_SCORE - 1, WIN_SCORE + 1
+        iteration_move, iteration_score = None, -WIN_SCORE - 1
+        try:
+            for move in searcher.ordered(symbol, 0, best_move):
+                bb.play(move, symbol)
+                score = -searcher.negamax(depth - 1, -beta, -alpha, opponent, 1)
+                bb.undo()
+                if score > iteration_score:
+                    iteration_score, iteration_move = score, move
+                    alpha = max(alpha, score)
+        except SearchTimeout:
+            # Unwind the moves the aborted iteration left on the board.
+            while len(bb.history) > base:
+                bb.undo()
+            break
+        best_move, best_score, completed = iteration_move, iteration_score, depth
+        key, mirrored = bb.canonical_hash(symbol)
+        tt.store(key, depth, EXACT, best_score, best_move ^ mirrored)
+        if abs(best_score) > WIN_THRESHOLD:
+            break
+
+    return SearchResult(
+        move=decode_move(best_move) if best_move is not None else None,
+        score=best_score,
+        depth=completed,
+        nodes=searcher.nodes,
+        elapsed=time.perf_counter() - start,
+        pv=principal_variation(bb, symbol, best_move, completed, tt),
+        cutoffs=searcher.cutoffs,
+    )
+
+
+def principal_variation(bb: BitBoard, symbol, first_move, max_len, tt=None):
+    """Follow best moves stored in the transposition table from ``first_move``."""
+    tt = _tt if tt is None else tt
+    line = []
+    move = first_move
+    while move is not None and len(line) < max_len and bb.play(move, symbol) >= 0:
+        line.append(decode_move(move))
+        if bb.has_won(symbol) or bb.is_full():
+            break
+        symbol = other(symbol)
+        key, mirrored = bb.canonical_hash(symbol)
+        entry = tt.probe(key)
+        move = entry[4] ^ mirrored if entry is not None and entry[4] is not None else None
+    for _ in line:
+        bb.undo()
+    return line
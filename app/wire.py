@@ -0,0 +1,81 @@
+import json
+import struct
+from typing import NamedTuple, Union
+
+from .bitboard import BitBoard
+
+# Wire formats for game updates sent to WebSocket clients.
+#
+# protocol "full" (the default) sends the whole GameState as JSON on every
+# update. protocol "delta" sends a snapshot when the client connects or asks
+# to resync, then only the move just played with the resulting status, turn
+# and version (the game's ply). A client that sees a version other than its
+# last one plus one should send {"type": "resync"}; deltas at or below the
+# snapshot's version are stale and can be ignored.
+#
+# encoding "binary" packs delta messages into fixed-size structs:
+#   delta:    B type=1, I version, B player, B row, B side, B status, B turn
+#   snapshot: B type=2, I version, Q board_x, Q board_o, B status, B turn,
+#             H length, then that many bytes of JSON {"id", "player_1", "player_2"}
+#   deleted:  B type=3
+# Symbols are 0 = 'x', 1 = 'o'; sides 0 = 'L', 1 = 'R'; statuses index STATUSES.
+
+PROTOCOLS = ("full", "delta")
+ENCODINGS = ("json", "binary")
+
+STATUSES = ("in_progress", "x_won", "o_won", "draw", "abandoned")
+SYMBOLS = ("x", "o")
+SIDES = ("L", "R")
+
+DELTA = 1
+SNAPSHOT = 2
+DELETED = 3
+
+_DELTA = struct.Struct("<BIBBBBB")
+_SNAPSHOT = struct.Struct("<BIQQBBH")
+_DELETED = struct.Struct("<B")
+
+
+class WireFormat(NamedTuple):
+    protocol: str = "full"
+    encoding: str = "json"
+
+
+FULL_JSON = WireFormat()
+
+Message = Union[str, bytes]
+
+
+def snapshot(fmt: WireFormat, state: dict, version: int) -> Message:
+    if fmt.protocol == "full":
+        return json.dumps(state)
+    if fmt.encoding == "json":
+        return json.dumps({"type": "snapshot", "version": version, "state": state})
+    bb = BitBoard.from_board(state["board"])
+    players = json.dumps({k: state[k] for k in ("id", "player_1", "player_2")}).encode()
+    return _SNAPSHOT.pack(
+        SNAPSHOT, version, bb.x, bb.o, STATUSES.index(state["status"]),
+        SYMBOLS.index(state["current_turn"]), len(players)) + players
+
+
+def update(fmt: WireFormat, event: dict) -> Message:
+    # Encodes an "update" event from the game channel.
+    move = event.get("move")
+    if fmt.protocol == "full" or move is None:
+        return snapshot(fmt, event["state"], event["ply"])
+    state = event["state"]
+    if fmt.encoding == "json":
+        return json.dumps({
+            "type": "delta", "version": event["ply"], "move": move,
+            "status": state["status"], "current_turn": state["current_turn"]})
+    return _DELTA.pack(
+        DELTA, event["ply"], SYMBOLS.index(move["player"]), move["row"], SIDES.index(move["side"]),
+        STATUSES.index(state["status"]), SYMBOLS.index(state["current_turn"]))
+
+
+def deleted(fmt: WireFormat, game_id: str) -> Message:
+    if fmt.protocol == "full":
+        return json.dumps({"id": game_id, "status": "deleted"})
+    if fmt.encoding == "json":
+        return json.dumps({"type": "deleted", "id": game_id})
+    return _DELETED.pack(DELETED)
@@ -0,0 +1,52 @@
+"""Compare minimax throughput of the bitboard engine against the legacy list engine.
+
+    python -m benchmarks.bench_bitboard [--depth 3] [--repeat 3]
+
+Both engines walk exactly the same tree (same move order, same cut-offs), so the
+node count measured on the legacy engine is used for both.
+"""
+import argparse
+import time
+
+from app import game_logic
+from . import legacy
+from .corpus import corpus
+
+
+def timed(fn, repeat):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--depth', type=int, default=3)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    positions = corpus()
+
+    legacy.nodes = 0
+    legacy_time, legacy_scores = timed(
+        lambda: [legacy.minimax_smart(b, args.depth, True, s) for b, s in positions], args.repeat)
+    nodes = legacy.nodes // args.repeat
+
+    bitboard_time, bitboard_scores = timed(
+        lambda: [game_logic.minimax_smart(b, args.depth, True, s) for b, s in positions], args.repeat)
+
+    if legacy_scores != bitboard_scores:
+        raise SystemExit("Engines disagree: %r != %r" % (legacy_scores, bitboard_scores))
+
+    print(f"positions: {len(positions)}  depth: {args.depth}  nodes: {nodes}")
+    print(f"legacy   : {legacy_time:8.3f}s  {nodes / legacy_time:12,.0f} nodes/sec")
+    print(f"bitboard : {bitboard_time:8.3f}s  {nodes / bitboard_time:12,.0f} nodes/sec")
+    print(f"speedup  : {legacy_time / bitboard_time:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+"""Fixed, seeded positions shared by the benchmarks."""
+import random
+
+from app import game_logic
+
+
+def random_position(rng, plies):
+    board = game_logic.initial_board()
+    symbol = 'x'
+    moves = [(row, side) for row in range(game_logic.ROWS) for side in ('L', 'R')]
+    for _ in range(plies):
+        rng.shuffle(moves)
+        for row, side in moves:
+            if game_logic.apply_move(board, row, side, symbol):
+                break
+        if game_logic.check_winner(board, symbol) or game_logic.board_full(board):
+            break
+        symbol = 'o' if symbol == 'x' else 'x'
+    return board, symbol
+
+
+def _undecided(rng, plies, count):
+    positions = []
+    while len(positions) < count:
+        board, symbol = random_position(rng, plies)
+        if not (game_logic.check_winner(board, 'x') or game_logic.check_winner(board, 'o')
+                or game_logic.board_full(board)):
+            positions.append((board, symbol))
+    return positions
+
+
+def corpus(seed=7):
+    rng = random.Random(seed)
+    return [random_position(rng, plies) for plies in (0, 4, 8, 12, 16, 20, 24, 30)]
+
+
+def phases(seed=11, per_phase=4):
+    """Opening, middlegame and near-full positions nobody has won yet."""
+    rng = random.Random(seed)
+    return {
+        'opening': _undecided(rng, 4, per_phase),
+        'middlegame': _undecided(rng, 20, per_phase),
+        'near_full': _undecided(rng, 40, per_phase),
+    }
@@ -0,0 +1,110 @@
+"""List-of-lists engine as it was before the bitboard rewrite.
+
+Kept only as a reference point for benchmarks; the app never imports it.
+Node counting is added so both engines can be compared per node.
+"""
+import copy
+
+ROWS = 7
+COLS = 7
+
+nodes = 0
+
+
+def apply_move(board, row, side, symbol):
+    if side == 'L':
+        for col in range(COLS):
+            if board[row][col] == '_':
+                board[row][col] = symbol
+                return True
+    elif side == 'R':
+        for col in reversed(range(COLS)):
+            if board[row][col] == '_':
+                board[row][col] = symbol
+                return True
+    return False
+
+
+def check_winner(board, symbol):
+    for r in range(ROWS):
+        for c in range(COLS):
+            if c + 3 < COLS and all(board[r][c+i] == symbol for i in range(4)):
+                return True
+            if r + 3 < ROWS and all(board[r+i][c] == symbol for i in range(4)):
+                return True
+            if r + 3 < ROWS and c + 3 < COLS and all(board[r+i][c+i] == symbol for i in range(4)):
+                return True
+            if r + 3 < ROWS and c - 3 >= 0 and all(board[r+i][c-i] == symbol for i in range(4)):
+                return True
+    return False
+
+
+def board_full(board):
+    return all(cell != '_' for row in board for cell in row)
+
+
+def score_window(window, bot_symbol, opponent_symbol):
+    bot_count = window.count(bot_symbol)
+    opp_count = window.count(opponent_symbol)
+    if bot_count > 0 and opp_count > 0:
+        return 0
+    if bot_count > 0:
+        return bot_count
+    elif opp_count > 0:
+        return -opp_count
+    return 0
+
+
+def evaluate_board(board, bot_symbol):
+    opponent_symbol = 'o' if bot_symbol == 'x' else 'x'
+    score = 0
+    for r in range(ROWS):
+        for c in range(COLS - 3):
+            window = [board[r][c+i] for i in range(4)]
+            score += score_window(window, bot_symbol, opponent_symbol)
+    for c in range(COLS):
+        for r in range(ROWS - 3):
+            window = [board[r+i][c] for i in range(4)]
+            score += score_window(window, bot_symbol, opponent_symbol)
+    for r in range(ROWS - 3):
+        for c in range(COLS - 3):
+            window = [board[r+i][c+i] for i in range(4)]
+            score += score_window(window, bot_symbol, opponent_symbol)
+    for r in range(ROWS - 3):
+        for c in range(3, COLS):
+            window = [board[r+i][c-i] for i in range(4)]
+            score += score_window(window, bot_symbol, opponent_symbol)
+    return score
+
+
+def minimax_smart(board, depth, maximizing, bot_symbol, alpha=float('-inf'), beta=float('inf')):
+    global nodes
+    nodes += 1
+    opponent_symbol = 'o' if bot_symbol == 'x' else 'x'
+    if board_full(board) or depth == 0:
+        return evaluate_board(board, bot_symbol)
+
+    if maximizing:
+        max_eval = float('-inf')
+        for row in range(ROWS):
+            for side in ['L', 'R']:
+                temp_board = copy.deepcopy(board)
+                if apply_move(temp_board, row, side, bot_symbol):
+                    eval = minimax_smart(temp_board, depth - 1, False, bot_symbol, alpha, beta)
+                    max_eval = max(max_eval, eval)
+                    alpha = max(alpha, eval)
+                    if beta <= alpha:
+                        break
+        return max_eval
+    else:
+        min_eval = float('inf')
+        for row in range(ROWS):
+            for side in ['L', 'R']:
+                temp_board = copy.deepcopy(board)
+                if apply_move(temp_board, row, side, opponent_symbol):
+                    eval = minimax_smart(temp_board, depth - 1, True, bot_symbol, alpha, beta)
+                    min_eval = min(min_eval, eval)
+                    beta = min(beta, eval)
+                    if beta <= alpha:
+                        break
+        return min_eval
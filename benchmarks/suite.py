@@ -0,0 +1,240 @@
+"""Microbenchmark suite for the game engine and CRUD layer.
+
+    python -m benchmarks.suite [--out results.json] [--compare previous.json]
+                               [--only engine,bots,crud] [--hard-budget 0.25]
+
+Every benchmark reports ops/sec; searches also report nodes/sec. Each
+benchmark is then run once more under tracemalloc to record allocated blocks
+and peak traced bytes per op (kept out of the timed run, since tracing slows
+it down). Results are written as JSON so runs from different commits can be
+compared with --compare.
+"""
+import argparse
+import contextlib
+import io
+import json
+import platform
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from app import game_logic
+from app.bitboard import BitBoard
+from .corpus import corpus, phases
+
+MIN_TIME = 0.5
+
+
+def _measure(fn, min_time=MIN_TIME):
+    """Call ``fn`` until ``min_time`` elapses; ``fn`` returns (ops, nodes)."""
+    ops = nodes = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < min_time:
+        done, searched = fn()
+        ops += done
+        nodes += searched
+        elapsed = time.perf_counter() - start
+    return ops, nodes, elapsed
+
+
+def _allocations(fn):
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        ops, _ = fn()
+        _, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, 'filename') if stat.count_diff > 0)
+    return blocks / ops, peak / ops
+
+
+def run(name, fn, min_time=MIN_TIME):
+    ops, nodes, elapsed = _measure(fn, min_time)
+    blocks_per_op, peak_bytes_per_op = _allocations(fn)
+    result = {
+        'ops': ops,
+        'seconds': round(elapsed, 4),
+        'ops_per_sec': round(ops / elapsed, 2),
+        'alloc_blocks_per_op': round(blocks_per_op, 2),
+        'alloc_peak_bytes_per_op': round(peak_bytes_per_op, 1),
+    }
+    if nodes:
+        result['nodes'] = nodes
+        result['nodes_per_sec'] = round(nodes / elapsed, 2)
+    return result
+
+
+def format_result(name, result):
+    nodes = f"{result['nodes_per_sec']:>12,.0f} nodes/s" if 'nodes_per_sec' in result else " " * 20
+    return (f"{name:32} {result['ops_per_sec']:>12,.1f} ops/s {nodes}"
+            f" {result['alloc_blocks_per_op']:>9.1f} blocks/op")
+
+
+def engine_benchmarks():
+    positions = corpus()
+    boards = [board for board, _ in positions]
+    moves = [(row, side) for row in range(game_logic.ROWS) for side in ('L', 'R')]
+
+    def apply_move():
+        ops = 0
+        for board in boards:
+            for row, side in moves:
+                game_logic.apply_move([r[:] for r in board], row, side, 'x')
+                ops += 1
+        return ops, 0
+
+    def check_winner():
+        for board in boards:
+            game_logic.check_winner(board, 'x')
+        return len(boards), 0
+
+    def evaluate_board():
+        for board in boards:
+            game_logic.evaluate_board(board, 'x')
+        return len(boards), 0
+
+    def check_blocking_move():
+        for board, symbol in positions:
+            game_logic.check_blocking_move(board, symbol)
+        return len(positions), 0
+
+    bitboards = [BitBoard.from_board(board) for board in boards]
+
+    def bitboard_play_undo():
+        ops = 0
+        for bb in bitboards:
+            for move in bb.legal_moves():
+                bb.play(move, 'x')
+                bb.undo()
+                ops += 1
+        return ops, 0
+
+    return {
+        'apply_move': apply_move,
+        'check_winner': check_winner,
+        'evaluate_board': evaluate_board,
+        'check_blocking_move': check_blocking_move,
+        'bitboard_play_undo': bitboard_play_undo,
+    }
+
+
+def bot_benchmarks(hard_budget):
+    benchmarks = {}
+    for phase, positions in phases().items():
+        def medium(positions=positions):
+            nodes = 0
+            for board, symbol in positions:
+                nodes += game_logic.search_bot_move(board, symbol, game_logic.MEDIUM_BOT_DEPTH).nodes
+            return len(positions), nodes
+
+        def hard(positions=positions):
+            nodes = 0
+            for board, symbol in positions:
+                nodes += game_logic.search_bot_move(board, symbol, game_logic.CELLS, hard_budget).nodes
+            return len(positions), nodes
+
+        benchmarks[f'medium_bot_move/{phase}'] = medium
+        benchmarks[f'hard_bot_move/{phase}'] = hard
+    return benchmarks
+
+
+def crud_benchmarks():
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from app import crud, schemas
+    from app.database import Base
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    p1 = crud.create_player(db, schemas.PlayerCreate(nickname='bench_1', type='human'))
+    p2 = crud.create_player(db, schemas.PlayerCreate(nickname='bench_2', type='human'))
+    state = {'game': None, 'moves': []}
+
+    def new_game():
+        game = crud.create_game(db, schemas.GameCreateRequest(player_1_id=p1.id, player_2_id=p2.id))
+        state['game'] = game.id
+        # Fill rows in order; a game that ends early is replaced by a new one.
+        state['moves'] = [(row, side) for row in range(game_logic.ROWS) for side in ('L', 'R', 'L')]
+
+    def make_move():
+        if not state['moves']:
+            new_game()
+        game = crud.get_game(db, state['game'])
+        if game.status != 'in_progress':
+            new_game()
+            game = crud.get_game(db, state['game'])
+        row, side = state['moves'].pop(0)
+        crud.make_move(db, state['game'], schemas.Move(player=game.current_turn, row=row, side=side))
+        return 1, 0
+
+    new_game()
+    return {'crud.make_move[sqlite]': make_move}
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, previous):
+    print(f"\n{'benchmark':32} {'ops/s change':>14} {'nodes/s change':>16}")
+    for name, result in results.items():
+        old = previous.get('results', {}).get(name)
+        if not old:
+            continue
+        ops = result['ops_per_sec'] / old['ops_per_sec'] if old.get('ops_per_sec') else None
+        nodes = (result['nodes_per_sec'] / old['nodes_per_sec']
+                 if result.get('nodes_per_sec') and old.get('nodes_per_sec') else None)
+        print(f"{name:32} {f'{ops:.2f}x' if ops else '-':>14} {f'{nodes:.2f}x' if nodes else '-':>16}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--out', help="write results as JSON to this path")
+    parser.add_argument('--compare', help="JSON results of a previous run to compare against")
+    parser.add_argument('--only', default='engine,bots,crud', help="comma-separated groups to run")
+    parser.add_argument('--hard-budget', type=float, default=0.25, help="hard bot time budget in seconds")
+    parser.add_argument('--min-time', type=float, default=MIN_TIME, help="seconds per benchmark")
+    args = parser.parse_args()
+
+    groups = set(args.only.split(','))
+    benchmarks = {}
+    if 'engine' in groups:
+        benchmarks.update(engine_benchmarks())
+    if 'bots' in groups:
+        benchmarks.update(bot_benchmarks(args.hard_budget))
+    if 'crud' in groups:
+        benchmarks.update(crud_benchmarks())
+
+    results = {}
+    # The bots print when they spot forced moves; keep that out of the report.
+    for name, fn in benchmarks.items():
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = run(name, fn, args.min_time)
+        print(format_result(name, result))
+        results[name] = result
+
+    report = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'results': results,
+    }
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
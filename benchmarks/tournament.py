@@ -0,0 +1,202 @@
+"""Self-play tournament between two engine configurations.
+
+    python -m benchmarks.tournament medium hard:0.25 [--games 200] [--workers N]
+                                    [--seed 1] [--opening-plies 2] [--out results.json]
+
+An engine is ``easy``, ``medium[:depth]``, ``hard[:seconds]`` or
+``depth:N`` (fixed-depth search without a time budget). Games are played in
+pairs from the same seeded random opening, once with each engine as 'x', so
+neither engine profits from moving first or from a lucky opening. Games run
+in parallel across processes, each engine with its own transposition table.
+
+The report gives the first engine's score and Elo difference against the
+second with a 95% confidence interval, and each engine's average and p99
+think time and average nodes searched per move.
+"""
+import argparse
+import contextlib
+import io
+import json
+import math
+import multiprocessing
+import random
+import time
+from dataclasses import dataclass
+
+from app import game_logic
+from app.bitboard import BitBoard, other
+from app.search import TranspositionTable
+
+TT_BITS = 16
+
+
+@dataclass(frozen=True)
+class Engine:
+    name: str
+    kind: str  # 'easy' or 'search'
+    depth: int = 0
+    time_budget: float = None
+
+
+def parse_engine(spec):
+    kind, _, arg = spec.partition(':')
+    if kind == 'easy' and not arg:
+        return Engine(spec, 'easy')
+    if kind == 'medium':
+        return Engine(spec, 'search', depth=int(arg or game_logic.MEDIUM_BOT_DEPTH))
+    if kind == 'hard':
+        budget = float(arg) if arg else game_logic.HARD_BOT_TIME_BUDGET
+        return Engine(spec, 'search', depth=game_logic.CELLS, time_budget=budget)
+    if kind == 'depth' and arg:
+        return Engine(spec, 'search', depth=int(arg))
+    raise argparse.ArgumentTypeError(f"unknown engine {spec!r}")
+
+
+# Per-process transposition tables by engine index, so that even two engines
+# with the same spec don't share entries.
+_tables = {}
+
+
+def _think(engines, index, bb, symbol):
+    engine = engines[index]
+    if engine.kind == 'easy':
+        return game_logic.easy_bot_move(bb, symbol), 0
+    tt = _tables.setdefault(index, TranspositionTable(TT_BITS))
+    result = game_logic.search_bot_move(bb, symbol, engine.depth, engine.time_budget, tt)
+    return result.move, result.nodes
+
+
+def _opening(seed, plies):
+    rng = random.Random(seed)
+    bb = BitBoard()
+    symbol = 'x'
+    for _ in range(plies):
+        bb.play(rng.choice(bb.legal_moves()), symbol)
+        if bb.has_won(symbol) or bb.is_full():
+            break
+        symbol = other(symbol)
+    return bb, symbol
+
+
+def play_game(task):
+    """Plays one game; returns the winning engine index (None for a draw) and per-move stats."""
+    engines, index, seed, opening_plies = task
+    # Games come in pairs from the same opening with colors swapped.
+    pair = index // 2
+    first = index % 2
+    random.seed(seed * 1_000_003 + index)
+    for tt in _tables.values():
+        tt.clear()
+    bb, symbol = _opening(seed * 1_000_003 + pair, opening_plies)
+    players = {'x': first, 'o': 1 - first}
+    moves = []
+    if bb.has_won(symbol):
+        # A long random opening already decided the game.
+        return None, moves
+    winner = None
+    while not bb.is_full():
+        engine = players[symbol]
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            move, nodes = _think(engines, engine, bb, symbol)
+        moves.append((engine, time.perf_counter() - start, nodes))
+        row, side = move
+        bb.play(row * 2 + (side == 'R'), symbol)
+        if bb.has_won(symbol):
+            winner = engine
+            break
+        symbol = other(symbol)
+    return winner, moves
+
+
+def elo(score):
+    if score <= 0:
+        return -math.inf
+    if score >= 1:
+        return math.inf
+    return -400 * math.log10(1 / score - 1)
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+def summarize(engines, results):
+    wins = sum(winner == 0 for winner, _ in results)
+    losses = sum(winner == 1 for winner, _ in results)
+    games = len(results)
+    draws = games - wins - losses
+    scores = [1.0 if winner == 0 else 0.0 if winner == 1 else 0.5 for winner, _ in results]
+    score = sum(scores) / games
+    stdev = math.sqrt(sum((s - score) ** 2 for s in scores) / games)
+    margin = 1.96 * stdev / math.sqrt(games)
+    report = {
+        'games': games,
+        'wins': wins,
+        'draws': draws,
+        'losses': losses,
+        'score': round(score, 4),
+        'elo': round(elo(score), 1),
+        'elo_low': round(elo(score - margin), 1),
+        'elo_high': round(elo(score + margin), 1),
+        'engines': {},
+    }
+    for index, engine in enumerate(engines):
+        times = [t for _, moves in results for e, t, _ in moves if e == index]
+        nodes = [n for _, moves in results for e, _, n in moves if e == index]
+        # Mirror matches such as ``medium medium`` report each side separately.
+        name = engine.name if engine.name != engines[1 - index].name else f"{engine.name}#{index + 1}"
+        report['engines'][name] = {
+            'moves': len(times),
+            'avg_think_ms': round(1000 * sum(times) / len(times), 3) if times else 0.0,
+            'p99_think_ms': round(1000 * _percentile(times, 0.99), 3),
+            'avg_nodes': round(sum(nodes) / len(nodes), 1) if nodes else 0.0,
+        }
+    return report
+
+
+def format_report(engines, report):
+    lines = [
+        f"{engines[0].name} vs {engines[1].name}: {report['games']} games, "
+        f"+{report['wins']} ={report['draws']} -{report['losses']} (score {report['score']:.3f})",
+        f"Elo {report['elo']:+.1f} (95% CI {report['elo_low']:+.1f} .. {report['elo_high']:+.1f})",
+        f"\n{'engine':16} {'moves':>8} {'avg ms':>10} {'p99 ms':>10} {'avg nodes':>12}",
+    ]
+    for name, stats in report['engines'].items():
+        lines.append(f"{name:16} {stats['moves']:>8} {stats['avg_think_ms']:>10.2f} "
+                     f"{stats['p99_think_ms']:>10.2f} {stats['avg_nodes']:>12,.0f}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('engines', nargs=2, type=parse_engine, help="two engine specs, e.g. medium hard:0.25")
+    parser.add_argument('--games', type=int, default=100, help="games to play, rounded up to an even number")
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count(), help="parallel processes")
+    parser.add_argument('--seed', type=int, default=1, help="seed for openings and the easy bot")
+    parser.add_argument('--opening-plies', type=int, default=2, help="random plies before the engines take over")
+    parser.add_argument('--out', help="write the report as JSON to this path")
+    args = parser.parse_args()
+
+    engines = tuple(args.engines)
+    games = args.games + args.games % 2
+    tasks = [(engines, index, args.seed, args.opening_plies) for index in range(games)]
+    start = time.perf_counter()
+    with multiprocessing.Pool(args.workers) as pool:
+        results = pool.map(play_game, tasks, chunksize=1)
+    report = summarize(engines, results)
+    report['seconds'] = round(time.perf_counter() - start, 2)
+    print(format_report(engines, report))
+    print(f"\n{games} games in {report['seconds']:.1f}s on {args.workers} workers")
+    if args.out:
+        # A clean sweep has an infinite Elo difference, which JSON can't hold.
+        for key in ('elo', 'elo_low', 'elo_high'):
+            if not math.isfinite(report[key]):
+                report[key] = None
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+import copy
+import random
+
+import pytest
+
+from app.bitboard import BitBoard, MOVES, decode_move, other
+from benchmarks import legacy
+
+
+def _random_board(rng, moves):
+    # Random play, carrying on past four-in-a-row so won positions show up too.
+    board = [['_'] * legacy.COLS for _ in range(legacy.ROWS)]
+    symbol = 'x'
+    for _ in range(moves):
+        row, side = rng.randrange(legacy.ROWS), rng.choice('LR')
+        if legacy.apply_move(board, row, side, symbol):
+            symbol = other(symbol)
+    return board
+
+
+def _positions(count=200, seed=1):
+    rng = random.Random(seed)
+    return [_random_board(rng, rng.randrange(60)) for _ in range(count)]
+
+
+def _state(bb):
+    # A full row may keep any left > right, so only free spans are compared.
+    spans = [(lo, hi) if lo <= hi else None for lo, hi in zip(bb.left, bb.right)]
+    return (bb.x, bb.o, spans, bb.count, bb.key, bb.mirror_key, list(bb.windows), bb.score)
+
+
+def _after(board, move, symbol):
+    board = copy.deepcopy(board)
+    row, side = decode_move(move)
+    return board if legacy.apply_move(board, row, side, symbol) else None
+
+
+def test_has_won_and_evaluate_match_legacy():
+    for board in _positions():
+        bb = BitBoard.from_board(board)
+        for symbol in ('x', 'o'):
+            assert bb.has_won(symbol) == legacy.check_winner(board, symbol)
+            assert bb.evaluate(symbol) == legacy.evaluate_board(board, symbol)
+
+
+def test_tactics_match_legacy():
+    checked = 0
+    for board in _positions():
+        if legacy.check_winner(board, 'x') or legacy.check_winner(board, 'o'):
+            continue
+        bb = BitBoard.from_board(board)
+        for symbol in ('x', 'o'):
+            tactics = bb.tactics(symbol)
+            moves = [m for m in MOVES if _after(board, m, symbol) is not None]
+            assert tactics.moves == moves
+            assert tactics.wins == [m for m in moves if legacy.check_winner(_after(board, m, symbol), symbol)]
+            opponent = other(symbol)
+            assert tactics.blocks == [m for m in moves if legacy.check_winner(_after(board, m, opponent), opponent)]
+        checked += 1
+    assert checked > 50
+
+
+def test_play_and_undo_keep_incremental_state():
+    rng = random.Random(2)
+    for board in _positions(50, seed=3):
+        bb = BitBoard.from_board(board)
+        before = _state(bb), list(bb.left), list(bb.right)
+        played = []
+        symbol = 'x'
+        while len(played) < 6 and bb.legal_moves():
+            move = rng.choice(bb.legal_moves())
+            bb.play(move, symbol)
+            played.append(move)
+            # Incremental updates agree with packing the position from scratch.
+            assert _state(bb) == _state(BitBoard.from_board(bb.to_board()))
+            symbol = other(symbol)
+        for _ in played:
+            bb.undo()
+        assert (_state(bb), bb.left, bb.right) == before
+
+
+def test_play_on_a_full_row_is_rejected():
+    bb = BitBoard()
+    for _ in range(legacy.COLS):
+        bb.play(0, 'x')
+    before = _state(bb)
+    assert bb.play(0, 'o') == -1 and bb.play(1, 'o') == -1
+    assert _state(bb) == before
+
+
+def test_round_trips():
+    for board in _positions():
+        bb = BitBoard.from_board(board)
+        assert bb.to_board() == board
+        assert _state(BitBoard.from_bits(bb.x, bb.o)) == _state(bb)
+
+
+def test_to_move_must_fit_stone_counts():
+    board = _random_board(random.Random(4), 9)
+    assert sum(row.count('x') for row in board) == sum(row.count('o') for row in board) + 1
+    assert BitBoard.from_board(board, 'o').to_board() == board
+    with pytest.raises(ValueError):
+        BitBoard.from_board(board, 'x')
+
+
+@pytest.mark.parametrize("board", [
+    [['_'] * 7] * 6,
+    [['_'] * 7] * 6 + [['_'] * 6],
+    [['_'] * 7] * 6 + [['_'] * 6 + ['q']],
+    [['_'] * 7] * 6 + [['_', 'x'] + ['_'] * 5],
+    [['x'] + ['_'] * 6] * 7,
+])
+def test_from_board_rejects_impossible_boards(board):
+    with pytest.raises(ValueError):
+        BitBoard.from_board(board, 'x')
@@ -0,0 +1,123 @@
+import asyncio
+import uuid
+
+from app import matchmaking
+from app.events import InMemoryEventBus
+from app.matchmaking import Matchmaker
+
+
+class FakeSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send_text(self, text):
+        self.sent.append(text)
+
+
+def _workers():
+    # Two server processes sharing one bus, each with its own worker id.
+    bus = InMemoryEventBus()
+    return Matchmaker(bus, worker_id="a"), Matchmaker(bus, worker_id="b")
+
+
+async def _settle():
+    # Let claim answers published from event handlers go out.
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_player_waiting_on_another_worker_is_matched_once():
+    async def run():
+        a, b = _workers()
+        player, opponent, third = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+        await b.wait(player, FakeSocket(), "default")
+        await a.wait(opponent, FakeSocket(), "default")
+
+        matched = await a.find_opponent(player, "default")
+        await _settle()
+
+        assert matched.id == opponent
+        assert player not in a.entries and player not in b.entries
+        assert len(a) == len(b) == 0
+        assert await a.find_opponent(third, "default") is None
+        assert await b.find_opponent(third, "default") is None
+
+    asyncio.run(run())
+
+
+def test_player_stays_queued_when_no_opponent_is_found():
+    async def run():
+        a, b = _workers()
+        player = uuid.uuid4()
+        await b.wait(player, FakeSocket(), "default")
+
+        assert await a.find_opponent(player, "default") is None
+        await _settle()
+
+        assert b.entries[player].owner == "b" and b.entries[player].websocket is not None
+        assert a.entries[player].owner == "b"
+        assert not b.pending
+
+    asyncio.run(run())
+
+
+def test_player_granted_to_a_match_is_not_matched_again():
+    async def run():
+        a, b = _workers()
+        player, first, second = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+        await a.wait(player, FakeSocket(), "default")
+        await b.wait(first, FakeSocket(), "default")
+        await a.wait(second, FakeSocket(), "default")
+
+        # first (waiting on b) pairs with the oldest player, who waits on a.
+        assert (await b.find_opponent(first, "default")).id == player
+        # player then asks for a match through a: already taken.
+        assert await a.find_opponent(player, "default") is None
+        await _settle()
+        assert second in a.entries and second in b.entries
+
+    asyncio.run(run())
+
+
+def test_player_granted_after_claim_timed_out_is_put_back(monkeypatch):
+    monkeypatch.setattr(matchmaking, "MATCHMAKING_CLAIM_TIMEOUT", 0)
+
+    async def run():
+        a, b = _workers()
+        player, opponent = uuid.uuid4(), uuid.uuid4()
+        await b.wait(opponent, FakeSocket(), "default")
+
+        # b grants the claim, but the answer only arrives after a gave up.
+        assert await a.find_opponent(player, "default") is None
+        await _settle()
+
+        assert not b.pending
+        assert b.entries[opponent].websocket is not None
+        assert a.entries[opponent].owner == "b"
+
+    asyncio.run(run())
+
+
+def test_cancelled_match_puts_both_players_back():
+    async def run():
+        a, b = _workers()
+        player, opponent = uuid.uuid4(), uuid.uuid4()
+        player_socket, opponent_socket = FakeSocket(), FakeSocket()
+        await b.wait(player, player_socket, "default")
+        await b.wait(opponent, opponent_socket, "default")
+
+        matched = await a.find_opponent(player, "default")
+        await _settle()
+        assert matched.id == opponent and len(b.pending) == 2
+
+        # Creating the game failed.
+        await a.cancel_match(matched)
+        await _settle()
+
+        assert not b.pending and not a.withdrawn
+        assert b.entries[player].websocket is player_socket
+        assert b.entries[opponent].websocket is opponent_socket
+        assert set(a.entries) == {player, opponent}
+        assert (await a.find_opponent(player, "default")).id == opponent
+
+    asyncio.run(run())
@@ -0,0 +1,65 @@
+import random
+
+import pytest
+
+from app.bitboard import BitBoard, CELLS, encode_move, other
+from app.search import WIN_SCORE, WIN_THRESHOLD, TranspositionTable, search
+
+
+def _negamax(bb, symbol, depth, ply):
+    # Plain fixed-depth negamax with the scoring rules of app.search.
+    if depth == 0 or bb.is_full():
+        return bb.evaluate(symbol)
+    if bb.tactics(symbol).wins:
+        return WIN_SCORE - ply - 1
+    best = -WIN_SCORE - 1
+    for move in bb.legal_moves():
+        bb.play(move, symbol)
+        best = max(best, -_negamax(bb, other(symbol), depth - 1, ply + 1))
+        bb.undo()
+    return best
+
+
+def _root_scores(bb, symbol, depth):
+    depth = min(depth, CELLS - bb.count)
+    scores = {}
+    for move in bb.legal_moves():
+        bb.play(move, symbol)
+        scores[move] = -_negamax(bb, other(symbol), depth - 1, 1)
+        bb.undo()
+    return scores
+
+
+def _positions(count, seed):
+    # Positions reached by random play where nobody has four in a row yet.
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        bb = BitBoard()
+        symbol = 'x'
+        for _ in range(rng.randrange(30)):
+            move = rng.choice(bb.legal_moves())
+            bb.play(move, symbol)
+            if bb.has_won(symbol):
+                break
+            symbol = other(symbol)
+        else:
+            positions.append((BitBoard.from_bits(bb.x, bb.o), symbol))
+    return positions
+
+
+@pytest.mark.parametrize("depth", [1, 2, 3, 4])
+def test_search_matches_plain_negamax(depth):
+    for bb, symbol in _positions(12, seed=depth):
+        before = bb.to_board()
+        result = search(bb, symbol, depth, None, TranspositionTable(16))
+        assert bb.to_board() == before
+
+        if bb.tactics(symbol).wins:
+            assert result.score == WIN_SCORE - 1
+            assert encode_move(*result.move) in bb.tactics(symbol).wins
+            continue
+        scores = _root_scores(bb, symbol, result.depth)
+        assert result.depth == depth or abs(result.score) > WIN_THRESHOLD
+        assert result.score == max(scores.values())
+        assert scores[encode_move(*result.move)] == result.score